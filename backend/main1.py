@@ -1,14 +1,21 @@
 import cv2
 import numpy as np
 import time
+import threading
 from models.area_counter import AreaVehicleCounter
+from models.batch_inference import BatchInferenceService
+from utils.hud import HudPanel
+from utils.frame_capture import ThreadedCapture
 import torch
 from ultralytics import YOLO
 
 class WebcamVideoProcessor:
-    def __init__(self, source=1, frame_width=800, frame_height=600):
+    def __init__(self, source=1, frame_width=800, frame_height=600, capture_policy=None, inference=None):
         """
         Initialize with an external webcam (source=1) or video file (source='path/to/video.mp4').
+        capture_policy is 'latest' (act on the newest frame), 'all' or 'stride' (see ThreadedCapture);
+        by default 'latest' for live cameras and 'all' for video files, so no file frames are skipped.
+        inference optionally shares a BatchInferenceService across cameras instead of a private model.
         """
         self.frame_width = frame_width
         self.frame_height = frame_height
@@ -19,14 +26,20 @@ class WebcamVideoProcessor:
             raise RuntimeError(f"Could not open {'external webcam' if source == 1 else 'video file'}")
 
         # Load YOLOv8n model for vehicle detection
-        self.model = YOLO('yolov8n.pt')  # Pre-trained YOLOv8 Nano model
+        self.model = inference or YOLO('yolov8n.pt')  # Pre-trained YOLOv8 Nano model
         self.class_names = self.model.names
         # Expand vehicle classes to include more types (e.g., bicycles, trucks, etc.)
         self.vehicle_classes = [0, 1, 2, 3, 5, 7]  # person, bicycle, car, motorcycle, bus, truck
 
+        # Decode on a background thread so inference never works on stale, buffered frames
+        if capture_policy is None:
+            capture_policy = 'latest' if isinstance(source, int) else 'all'
+        self.capture = ThreadedCapture(self.cap, (frame_height, frame_width), policy=capture_policy).start()
+        self.frame_timestamp = 0.0  # time.monotonic() capture time of the last frame
+
     def detect_vehicles(self, frame):
         """
-        Detect vehicles using YOLOv8n with improved settings and return detections in [x1, y1, x2, y2, track_id] format.
+        Detect vehicles using YOLOv8n with improved settings and return detections in [x1, y1, x2, y2, track_id, class_id] format.
         """
         # Preprocess frame for better detection (adjust brightness/contrast if needed)
         frame = cv2.convertScaleAbs(frame, alpha=1.2, beta=10)  # Increase brightness and contrast slightly
@@ -54,7 +67,7 @@ class WebcamVideoProcessor:
                     # Use a simple frame-based tracking (incremental track_id for this frame)
                     track_id = track_id_counter
                     track_id_counter += 1
-                    detections.append([x1, y1, x2, y2, track_id])
+                    detections.append([x1, y1, x2, y2, track_id, cls])
 
                     # Optional: Draw bounding boxes for debugging (remove in final version)
                     cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
@@ -67,18 +80,19 @@ class WebcamVideoProcessor:
         """
         Capture and process a frame from the external webcam, returning the frame and vehicle detections.
         """
-        ret, frame = self.cap.read()
-        if not ret:
+        captured = self.capture.read(timeout=5.0)
+        if captured is None:
             raise RuntimeError("Failed to capture frame from external webcam")
         
-        # Resize frame to match desired dimensions (800x600)
-        frame = cv2.resize(frame, (self.frame_width, self.frame_height))
+        # Frames arrive already resized to the desired dimensions (800x600)
+        frame, self.frame_timestamp, _ = captured
         
         detections = self.detect_vehicles(frame)
         return frame, detections
 
     def release(self):
-        """Release the video capture resource."""
+        """Stop the capture thread and release the video capture resource."""
+        self.capture.stop()
         self.cap.release()
 
 def draw_traffic_lights(frame, phase):
@@ -109,6 +123,8 @@ def main(source=1):
     episode_duration = 300  # 5 minutes
     frame_delay = 50  # ms (adjust for real-time performance)
     frame_count = 0
+    # Larger font, padding and opacity for readability over camera footage
+    hud = HudPanel(font_scale=1.0, opacity=0.8, padding=(15, 20), line_gap=15, line_step=40, baseline=20)
 
     cv2.namedWindow(f'Traffic Monitoring from External Webcam', cv2.WINDOW_NORMAL)
     
@@ -117,7 +133,8 @@ def main(source=1):
         
         while (time.time() - start_time) < episode_duration:
             frame, detections = processor.generate_frame()
-            counts, densities = area_counter.update(detections, frame.shape)
+            classes = detections[:, 5] if detections.size else None
+            counts, densities = area_counter.update(detections, frame.shape, classes=classes)
             
             # Simulate phase change (for visualization; RL would handle this)
             phase_time = time.time() - start_time
@@ -134,37 +151,9 @@ def main(source=1):
                 f"Vehicles: {len(detections)}"
             ]
             
-            # Enhanced text display with better background and formatting
-            text_color = (255, 255, 255)  # White text
-            bg_color = (0, 0, 0, 150)     # Darker black background with higher opacity
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 1.0              # Larger font for better readability
-            thickness = 2
-            
-            # Calculate text sizes for background box
-            max_width = 0
-            total_height = 0
-            for text in metrics:
-                (text_w, text_h), _ = cv2.getTextSize(text, font, font_scale, thickness)
-                max_width = max(max_width, text_w)
-                total_height += text_h + 15  # Increased spacing for readability
-            
-            x, y = 10, 10
-            box_w, box_h = max_width + 30, total_height + 20  # Larger padding for better contrast
-            
-            # Draw semi-transparent background box
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (x, y), (x + box_w, y + box_h), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.8, frame, 0.2, 0, frame)  # Higher opacity for better contrast
-            
-            # Draw metrics with improved positioning
-            y_pos = 30
-            for text in metrics + [f"North: {densities['north']:.1f}%", 
-                                 f"South: {densities['south']:.1f}%", 
-                                 f"East: {densities['east']:.1f}%", 
-                                 f"West: {densities['west']:.1f}%"]:
-                cv2.putText(frame, text, (x + 15, y_pos), font, font_scale, text_color, thickness)
-                y_pos += 40  # Larger spacing for lane densities
+            # Metrics and lane-wise densities over a translucent panel
+            hud.draw(frame, metrics + [f"{lane.capitalize()}: {density:.1f}%"
+                                       for lane, density in zip(area_counter.lane_names, densities)])
 
             cv2.imshow(f'Traffic Monitoring from External Webcam', frame)
             frame_count += 1
@@ -180,6 +169,56 @@ def main(source=1):
         cv2.destroyAllWindows()
         print(f"Monitoring completed\nTotal frames rendered: {frame_count}")
 
+def main_multi(sources=(0, 1), episode_duration=300):
+    """
+    Monitor several cameras at once, batching their frames through one shared YOLO model.
+    Each camera captures, detects and counts on its own thread; windows are shown on the main thread.
+    """
+    service = BatchInferenceService(YOLO('yolov8n.pt'), max_batch=len(sources))
+    processors = [WebcamVideoProcessor(source=source, inference=service) for source in sources]
+    latest = [None] * len(sources)  # Last annotated frame per camera
+    running = threading.Event()
+    running.set()
+
+    def run_camera(i):
+        area_counter = AreaVehicleCounter()
+        hud = HudPanel(font_scale=1.0, opacity=0.8, padding=(15, 20), line_gap=15, line_step=40, baseline=20)
+        while running.is_set():
+            try:
+                frame, detections = processors[i].generate_frame()
+            except RuntimeError as e:
+                print(f"Camera {sources[i]} stopped: {e}")
+                break
+            classes = detections[:, 5] if detections.size else None
+            _, densities = area_counter.update(detections, frame.shape, classes=classes)
+            # Copy out of the capture ring before handing the frame to the display thread
+            frame = area_counter.draw_visualization(frame.copy())
+            hud.draw(frame, [f"Vehicles: {len(detections)}"] +
+                     [f"{lane.capitalize()}: {density:.1f}%" for lane, density in zip(area_counter.lane_names, densities)])
+            latest[i] = frame
+
+    threads = [threading.Thread(target=run_camera, args=(i,), daemon=True) for i in range(len(sources))]
+    try:
+        for thread in threads:
+            thread.start()
+        start_time = time.time()
+        while (time.time() - start_time) < episode_duration and any(thread.is_alive() for thread in threads):
+            for source, frame in zip(sources, latest):
+                if frame is not None:
+                    cv2.imshow(f'Traffic Monitoring - camera {source}', frame)
+            if cv2.waitKey(50) & 0xFF == ord('q'):
+                break
+    finally:
+        running.clear()
+        for thread in threads:
+            thread.join(timeout=6.0)
+        for processor in processors:
+            processor.release()
+        service.stop()
+        cv2.destroyAllWindows()
+        print(f"Monitoring completed\nFrames inferred: {service.frames} in {service.batches} batches")
+
 if __name__ == "__main__":
     # Use source=1 for external webcam, or provide a video file path (e.g., 'path/to/video.mp4')
-    main(source=1)  # Default to external webcam; change to video path for stock video
\ No newline at end of file
+    main(source=1)  # Default to external webcam; change to video path for stock video
+    # For several cameras sharing one model: main_multi(sources=(0, 1))
\ No newline at end of file
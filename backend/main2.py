@@ -4,10 +4,10 @@ from collections import defaultdict, deque
 from ultralytics import YOLO
 
 class VehicleCounter:
-    def __init__(self, model_path='yolov8n.pt'):
-        """Initialize the VehicleCounter with YOLO model and configurations."""
+    def __init__(self, model_path='yolov8n.pt', inference=None):
+        """Initialize the VehicleCounter with YOLO model (or a shared BatchInferenceService) and configurations."""
         try:
-            self.model = YOLO(model_path)
+            self.model = inference or YOLO(model_path)
         except Exception as e:
             raise RuntimeError(f"Failed to load YOLO model: {e}")
             
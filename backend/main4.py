@@ -9,10 +9,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 class CarIntersectionCounter:
-    def __init__(self, model_path='yolov8x.pt'):
-        """Initialize the CarIntersectionCounter with YOLO model."""
+    def __init__(self, model_path='yolov8x.pt', inference=None):
+        """Initialize the CarIntersectionCounter with YOLO model (or a shared BatchInferenceService)."""
         try:
-            self.model = YOLO(model_path)  # Load YOLOv8 model
+            self.model = inference or YOLO(model_path)  # Load YOLOv8 model
             logger.info("YOLOv8 model loaded successfully.")
         except Exception as e:
             logger.error(f"Failed to load YOLO model: {e}")
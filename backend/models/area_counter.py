@@ -1,162 +1,563 @@
+import threading
+from collections import OrderedDict, namedtuple
+
 import numpy as np
 import cv2
+from models.lane_geometry import LaneGeometry, box_coverage
+from models.ring_buffer import RingBuffer
+from models.spatial_hash import suppress_duplicates
+
+# Emitted by AreaVehicleCounter.update_incremental when a track enters or leaves a lane
+LaneEvent = namedtuple('LaneEvent', ['track_id', 'lane', 'kind'])  # kind is 'enter' or 'leave'
+
+# Passenger-car-unit weight per COCO class id; unlisted classes count as one car
+DEFAULT_PCU_WEIGHTS = {
+    0: 0.0,   # person
+    1: 0.5,   # bicycle
+    2: 1.0,   # car
+    3: 0.5,   # motorcycle
+    5: 3.0,   # bus
+    7: 3.0    # truck
+}
+
+
+def _pcu_table(weights):
+    """Build a lookup array mapping class id to PCU weight."""
+    table = np.ones(max(weights, default=0) + 1, dtype=np.float64)
+    for class_id, weight in weights.items():
+        table[class_id] = weight
+    return table
+
+
+def _class_weights(table, classes, n):
+    """Return the PCU weight of each of n detections (1.0 each when classes is None)."""
+    if classes is None:
+        return np.ones(n, dtype=np.float64)
+    classes = np.asarray(classes).astype(np.int64).ravel()
+    if len(classes) != n:
+        raise ValueError(f"Expected {n} class ids, got {len(classes)}")
+    known = (classes >= 0) & (classes < len(table))
+    return np.where(known, table[np.clip(classes, 0, len(table) - 1)], 1.0)
+
+
+def _occupancy_density(occupancy, cells):
+    """Lane densities (%) from covered fractions and their mean over lanes with a non-empty ROI."""
+    valid = cells > 0
+    density = np.where(valid, occupancy * 100.0, 0.0)
+    valid_lanes = valid.sum(axis=-1)
+    percentage = np.where(valid_lanes > 0, density.sum(axis=-1) / np.maximum(valid_lanes, 1), 0.0)
+    return density, percentage
+
+
+def _make_layer(layer, alpha, rects):
+    """Package a pre-rendered layer for _composite; soft (antialiased) alpha gets blend weights."""
+    if np.isin(alpha, (0, 255)).all():
+        return layer, alpha, rects, None
+    # Un-premultiply the colors and keep float weights for cv2.blendLinear
+    weights = alpha.astype(np.float32) / 255
+    colors = np.where(alpha[..., None] > 0, layer / np.maximum(weights, 1e-6)[..., None], 0)
+    return np.clip(colors, 0, 255).astype(np.uint8), alpha, rects, (weights, 1 - weights)
+
+
+def _composite(frame, layer, alpha, rects, blend=None):
+    """Draw a pre-rendered layer into frame in place, touching only its bounding rectangles."""
+    for x1, y1, x2, y2 in rects:
+        if blend is None:
+            cv2.copyTo(layer[y1:y2, x1:x2], alpha[y1:y2, x1:x2], frame[y1:y2, x1:x2])
+        else:
+            frame[y1:y2, x1:x2] = cv2.blendLinear(layer[y1:y2, x1:x2], frame[y1:y2, x1:x2],
+                                                  blend[0][y1:y2, x1:x2], blend[1][y1:y2, x1:x2])
+
+
+def _bounding_rect(points, pad, frame_shape):
+    """Return the (x1, y1, x2, y2) box around points, padded and clipped to the frame."""
+    h, w = frame_shape[:2]
+    points = np.asarray(points).reshape(-1, 2)
+    x1, y1 = np.maximum(points.min(axis=0) - pad, 0)
+    x2, y2 = np.minimum(points.max(axis=0) + pad + 1, (w, h))
+    return int(x1), int(y1), max(int(x2), int(x1)), max(int(y2), int(y1))
+
+
+def _pad_stack(arrays):
+    """Stack 2-D uint8 arrays of different shapes into one zero-padded (N, H, W) array."""
+    shapes = np.array([a.shape for a in arrays], dtype=np.intp).reshape(-1, 2)
+    stack = np.zeros((len(arrays),) + tuple(shapes.max(axis=0) if len(arrays) else (1, 1)), dtype=np.uint8)
+    for i, a in enumerate(arrays):
+        stack[i, :a.shape[0], :a.shape[1]] = a
+    return stack, shapes
+
+
+def detection_boxes(detections):
+    """Return integer (x1, y1, x2, y2) boxes for an (N, 5+) detection array."""
+    detections = np.asarray(detections)
+    if detections.ndim != 2 or detections.shape[1] < 5:
+        print(f"Warning: Invalid detection format - expected (N, 5) array, got shape {detections.shape}")
+        return np.empty((0, 4), dtype=np.int64)
+    try:
+        return detections[:, :4].astype(np.int64)
+    except (ValueError, TypeError) as e:
+        print(f"Warning: Invalid detection format - {e}")
+        return np.empty((0, 4), dtype=np.int64)
+
 
 class AreaVehicleCounter:
-    def __init__(self):
-        self.lane_rois = {
-            'north': None,
-            'south': None,
-            'east': None,
-            'west': None
-        }
-        self.lane_counts = {lane: 0 for lane in self.lane_rois}
-        self.lane_densities = {lane: 0.0 for lane in self.lane_rois}
+    # update_many stacks keyed by (geometry ids, stride); one entry per group of counters sharing a call
+    _mask_stack_cache = OrderedDict()
+    _mask_stack_cache_size = 8
+    _mask_stack_lock = threading.Lock()
+
+    def __init__(self, lanes=('north', 'south', 'east', 'west')):
+        self.lane_rois = {lane: None for lane in lanes}
+        self.counts = np.zeros(len(self.lane_rois), dtype=np.int64)  # Per-lane counts in lane_names order
+        self.densities = np.zeros(len(self.lane_rois), dtype=np.float64)  # Per-lane densities (%)
         self.density_percentage = 0.0
-        self.avg_vehicle_area = 800  # Can be fine-tuned based on observation
+        self.pcu_loads = np.zeros(len(self.lane_rois), dtype=np.float64)  # Per-lane passenger-car units
+        self.pcu_weights = dict(DEFAULT_PCU_WEIGHTS)
+        self.history = RingBuffer(len(self.lane_rois))  # Recent per-lane densities for smoothing
+        self.coverage_stride = 4  # Sampling step (px) of the box-coverage raster used for density
+        self.merge_radius = 30  # Centers closer than this (px) are treated as one vehicle
+        self.suppressed_indices = np.empty(0, dtype=np.intp)  # Detection rows dropped as duplicates
         self.rois_initialized = False
+        self.frame_shape = None  # (height, width) of the last frame seen
+        self.geometry = None  # LaneGeometry compiled for the current frame shape
+        self.geometry_cache_size = 4  # Frame shapes kept compiled (e.g. preview and full resolution)
+        self._geometries = OrderedDict()  # LRU of frame shape -> LaneGeometry
+        self._pending_rois = {}  # Pixel ROIs set before any frame shape was known, normalized on first use
+        self.subscribers = []  # Callables receiving the list of LaneEvents from update_incremental
+        self._track_ids = np.empty(0, dtype=np.int64)  # Sorted ids of tracks seen last frame
+        self._track_lanes = np.empty(0, dtype=np.intp)  # 1-based lane of each track, 0 if outside
+        self._lane_index_cache = {}
+        self._pcu_table = None  # (weights, lookup array) built from pcu_weights
+        self._overlay = None  # (geometry, frame_shape, layer) of pre-rendered ROIs and stop lines
+        self._text_patch = None  # (lines, frame_shape, layer) of the last rendered density text
+
+    @property
+    def lane_names(self):
+        """Lane names in the fixed order used by counts and densities."""
+        return tuple(self.lane_rois)
+
+    @property
+    def lane_counts(self):
+        """Per-lane counts as a dict (built on demand)."""
+        return dict(zip(self.lane_rois, self.counts.tolist()))
+
+    @property
+    def lane_densities(self):
+        """Per-lane densities as a dict (built on demand)."""
+        return dict(zip(self.lane_rois, self.densities.tolist()))
+
+    @property
+    def lane_pcu_loads(self):
+        """Per-lane PCU loads as a dict (built on demand)."""
+        return dict(zip(self.lane_rois, self.pcu_loads.tolist()))
+
+    def lane_index(self, lanes):
+        """Return (cached) positions of the given lanes in lane_names order."""
+        key = tuple(lanes)
+        if key not in self._lane_index_cache:
+            self._lane_index_cache[key] = np.array([self.lane_names.index(lane) for lane in key], dtype=np.intp)
+        return self._lane_index_cache[key]
 
     def reset(self):
         """Reset counters and densities to initial state."""
-        self.lane_counts = {lane: 0 for lane in self.lane_rois}
-        self.lane_densities = {lane: 0.0 for lane in self.lane_rois}
+        self.counts = np.zeros(len(self.lane_rois), dtype=np.int64)
+        self.densities = np.zeros(len(self.lane_rois), dtype=np.float64)
+        self.pcu_loads = np.zeros(len(self.lane_rois), dtype=np.float64)
         self.density_percentage = 0.0
-        return self.lane_counts, self.lane_densities
+        self.suppressed_indices = np.empty(0, dtype=np.intp)
+        self.history.clear()
+        self._track_ids = np.empty(0, dtype=np.int64)
+        self._track_lanes = np.empty(0, dtype=np.intp)
+        return self.counts, self.densities
+
+    def add_lane(self, lane, points=None, frame_shape=None, normalized=False):
+        """Declare an additional named lane (e.g. a turn pocket or bus lane), optionally with its ROI."""
+        if lane in self.lane_rois:
+            raise ValueError(f"Lane already exists: {lane}")
+        self.lane_rois[lane] = None
+        self.history = RingBuffer(len(self.lane_rois), self.history.capacity, self.history.ewma_alpha)
+        self._lane_index_cache = {}
+        self._invalidate_geometry()
+        self.reset()
+        if points is not None:
+            self.set_lane_roi(lane, points, frame_shape, normalized)
+
+    def set_lane_roi(self, lane, points, frame_shape=None, normalized=False):
+        """Set ROI for a specific lane with validation.
 
-    def set_lane_roi(self, lane, points):
-        """Set ROI for a specific lane with validation."""
+        Pixel points are relative to frame_shape (default: the last frame seen) and are
+        stored normalized, so the ROI follows the stream across resolution changes. Pixel
+        points set before any frame is seen are kept as-is and normalized against the
+        first frame shape.
+        """
         if lane not in self.lane_rois:
             raise ValueError(f"Invalid lane: {lane}")
         if len(points) < 3:
             raise ValueError("ROI must have at least 3 points")
-        self.lane_rois[lane] = np.array(points, dtype=np.int32)
+        points = np.array(points, dtype=np.float64).reshape(-1, 2)
+        self._pending_rois.pop(lane, None)
+        if not normalized:
+            shape = tuple(frame_shape[:2]) if frame_shape else self.frame_shape
+            if shape is None:
+                self._pending_rois[lane] = points
+                self.rois_initialized = True
+                self._invalidate_geometry()
+                return
+            points /= (shape[1], shape[0])
+        self.lane_rois[lane] = points
         self.rois_initialized = True
+        self._invalidate_geometry()
+
+    def geometry_for(self, frame_shape=None):
+        """Return the lane geometry for frame_shape (default: the last frame shape seen).
+
+        Like update, the first frame shape fills in the default ROIs if none were set, so
+        trackers sharing this counter's lanes can run before or without it.
+        """
+        if frame_shape and not self.rois_initialized:
+            self._set_default_rois(frame_shape)
+        return self._get_geometry(frame_shape)
 
     def calculate_roi_area(self, lane):
-        """Calculate the area of a lane ROI."""
+        """Calculate the area of a lane ROI in pixels of the current frame shape."""
         if lane not in self.lane_rois:
             raise ValueError(f"Invalid lane: {lane}")
-        roi = self.lane_rois[lane]
-        return cv2.contourArea(roi) if roi is not None else 0
+        geometry = self._get_geometry()
+        return geometry.areas[geometry.index[lane]]
 
-    def update(self, detections, frame_shape=None):
-        """Update vehicle counts and densities based on detections, with improved accuracy."""
-        self.lane_counts = {lane: 0 for lane in self.lane_rois}
-        vehicle_centers = []
+    def update(self, detections, frame_shape=None, classes=None):
+        """Update vehicle counts and densities based on detections; returns per-lane arrays in lane_names order.
+
+        classes optionally gives the class id of each detection row, used to weight pcu_loads.
+        """
+        self.suppressed_indices = np.empty(0, dtype=np.intp)
         
         if frame_shape and not self.rois_initialized:
             self._set_default_rois(frame_shape)
+        geometry = self._get_geometry(frame_shape)
             
+        detections = np.asarray(detections)
         if not detections.size:
-            self.lane_densities = {lane: 0.0 for lane in self.lane_rois}
+            self.counts = np.zeros(len(geometry), dtype=np.int64)
+            self.densities = np.zeros(len(geometry), dtype=np.float64)
+            self.pcu_loads = np.zeros(len(geometry), dtype=np.float64)
             self.density_percentage = 0.0
-            return self.lane_counts, self.lane_densities
+            self.history.push(self.densities)
+            return self.counts, self.densities
             
-        for det in detections:
-            if len(det) < 5:
-                continue
-            try:
-                x1, y1, x2, y2, track_id = map(int, det[:5])
-                center = ((x1 + x2) // 2, (y1 + y2) // 2)
-                
-                # Avoid double-counting by checking proximity to existing centers
-                if any(np.linalg.norm(np.array(center) - np.array(c)) < 30 for c in vehicle_centers):
-                    continue
-                vehicle_centers.append(center)
-                
-                # Assign to lane with highest containment, considering boundary overlap
-                best_lane = None
-                max_containment = -float('inf')  # Use negative infinity for initial max
-                for lane, roi in self.lane_rois.items():
-                    if roi is not None:
-                        containment = cv2.pointPolygonTest(roi, center, False)
-                        if containment >= 0 and containment > max_containment:
-                            max_containment = containment
-                            best_lane = lane
-                if best_lane:
-                    self.lane_counts[best_lane] += 1
-            except (ValueError, TypeError) as e:
-                print(f"Warning: Invalid detection format - {e}")
-                continue
+        boxes = detection_boxes(detections)
+        centers = (boxes[:, :2] + boxes[:, 2:]) // 2
+        # Avoid double-counting by merging centers that fall within merge_radius of each other
+        suppressed = suppress_duplicates(centers, self.merge_radius)
+        self.suppressed_indices = np.flatnonzero(suppressed)
         
-        # Calculate densities with refined overlap handling
-        total_density = 0.0
-        valid_lanes = 0
-        for lane in self.lane_rois:
-            area = self.calculate_roi_area(lane)
-            if area > 0:
-                vehicle_area = self.lane_counts[lane] * self.avg_vehicle_area
-                # Apply non-linear scaling for congestion, with boundary adjustment
-                density = min(100.0, (vehicle_area / area) * 100 * (1 + self.lane_counts[lane] * 0.05))
-                self.lane_densities[lane] = density if density < 100 else 99.9  # Cap at 99.9 to avoid 100% saturation
-                total_density += self.lane_densities[lane]
-                valid_lanes += 1
+        # Assign every center to its lane with a single lookup into the label mask
+        labels = geometry.lookup(centers[~suppressed])
+        self.counts = np.bincount(labels, minlength=len(geometry) + 1)[1:]
+        weights = _class_weights(self._get_pcu_table(), classes, len(boxes))[~suppressed]
+        self.pcu_loads = np.bincount(labels, weights=weights, minlength=len(geometry) + 1)[1:]
         
-        self.density_percentage = total_density / valid_lanes if valid_lanes > 0 else 0.0
-        return self.lane_counts, self.lane_densities
+        # Density is the fraction of each lane ROI covered by the union of detection boxes
+        occupancy, cells = geometry.occupancy(boxes, self.coverage_stride)
+        self.densities, percentage = _occupancy_density(occupancy, cells)
+        self.density_percentage = float(percentage)
+        self.history.push(self.densities)
+        return self.counts, self.densities
+
+    def subscribe(self, callback):
+        """Register a callable that receives the list of LaneEvents emitted by each incremental update."""
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a previously registered event callback."""
+        self.subscribers.remove(callback)
+
+    def update_incremental(self, detections, frame_shape=None):
+        """Update counts from tracked detections, emitting enter/leave events only for tracks that changed lane.
+
+        detections must carry persistent track ids in column 4. Lane lookup is vectorized;
+        count updates and event emission cost O(changed tracks). Returns the events.
+        """
+        if frame_shape and not self.rois_initialized:
+            self._set_default_rois(frame_shape)
+        geometry = self._get_geometry(frame_shape)
+        if len(self.counts) != len(geometry):
+            self.reset()
+
+        detections = np.asarray(detections)
+        boxes = detection_boxes(detections) if detections.size else np.empty((0, 4), dtype=np.int64)
+        track_ids = detections[:, 4].astype(np.int64) if len(boxes) else np.empty(0, dtype=np.int64)
+        track_ids, first = np.unique(track_ids, return_index=True)  # Sorted; first box wins for repeated ids
+        centers = (boxes[first, :2] + boxes[first, 2:]) // 2
+        lanes = geometry.lookup(centers)
+
+        # Match against last frame's tracks by binary search on the sorted ids
+        prev_ids, prev_lanes = self._track_ids, self._track_lanes
+        pos = np.minimum(np.searchsorted(prev_ids, track_ids), max(len(prev_ids) - 1, 0))
+        seen = (prev_ids[pos] == track_ids) if len(prev_ids) else np.zeros(len(track_ids), dtype=bool)
+        before = np.where(seen, prev_lanes[pos] if len(prev_ids) else 0, 0)
+        moved = np.flatnonzero(before != lanes)
+        gone = np.ones(len(prev_ids), dtype=bool)
+        gone[pos[seen]] = False
+        gone = np.flatnonzero(gone & (prev_lanes > 0))
+
+        leave_ids = np.concatenate((prev_ids[gone], track_ids[moved]))
+        leave_lanes = np.concatenate((prev_lanes[gone], before[moved]))
+        left = leave_lanes > 0
+        leave_ids, leave_lanes = leave_ids[left], leave_lanes[left]
+        entered = lanes[moved] > 0
+        enter_ids, enter_lanes = track_ids[moved][entered], lanes[moved][entered]
+
+        self.counts = self.counts.copy()
+        np.subtract.at(self.counts, leave_lanes - 1, 1)
+        np.add.at(self.counts, enter_lanes - 1, 1)
+        self._track_ids, self._track_lanes = track_ids, lanes
+
+        names = geometry.names
+        events = ([LaneEvent(t, names[l - 1], 'leave') for t, l in zip(leave_ids.tolist(), leave_lanes.tolist())]
+                  + [LaneEvent(t, names[l - 1], 'enter') for t, l in zip(enter_ids.tolist(), enter_lanes.tolist())])
+        if events:
+            for callback in self.subscribers:
+                callback(events)
+        return events
+
+    @classmethod
+    def update_many(cls, counters, detections_list, frame_shapes=None, classes_list=None):
+        """Update one counter per camera in a single vectorized pass.
+
+        Returns (counts, densities) arrays of shape (N, lanes); each counter's
+        counts, densities, pcu_loads and suppressed_indices are refreshed as well.
+        """
+        if len(counters) != len(detections_list):
+            raise ValueError("Expected one detection array per counter")
+        lanes = counters[0].lane_names if counters else ()
+        if any(counter.lane_names != lanes for counter in counters):
+            raise ValueError("All counters must share the same lanes")
+        frame_shapes = frame_shapes if frame_shapes is not None else [None] * len(counters)
+        for counter, frame_shape in zip(counters, frame_shapes):
+            if frame_shape and not counter.rois_initialized:
+                counter._set_default_rois(frame_shape)
+        stride = counters[0].coverage_stride if counters else 1
+        if any(counter.coverage_stride != stride for counter in counters):
+            raise ValueError("All counters must share the same coverage_stride")
+        stack, shapes, coarse_stack, coarse_index, cells = cls._get_mask_stack(counters, frame_shapes, stride)
+
+        # Flatten every camera's detections into one array tagged with its camera index
+        boxes = []
+        for detections in detections_list:
+            detections = np.asarray(detections)
+            if detections.ndim == 2 and detections.shape[1] >= 5:
+                boxes.append(detections[:, :4])
+            else:
+                if detections.size:
+                    print(f"Warning: Invalid detection format - expected (N, 5) array, got shape {detections.shape}")
+                boxes.append(np.empty((0, 4)))
+        sizes = np.array([len(b) for b in boxes], dtype=np.intp)
+        camera = np.repeat(np.arange(len(counters)), sizes)
+        boxes = np.concatenate(boxes).astype(np.int64) if len(boxes) else np.empty((0, 4), dtype=np.int64)
+        centers = (boxes[:, :2] + boxes[:, 2:]) // 2
+
+        classes_list = classes_list if classes_list is not None else [None] * len(counters)
+        weights = np.concatenate([_class_weights(counter._get_pcu_table(), classes, size)
+                                  for counter, classes, size in zip(counters, classes_list, sizes)]
+                                 ) if len(counters) else np.empty(0)
+
+        radius = np.array([counter.merge_radius for counter in counters], dtype=np.float64)
+        suppressed = suppress_duplicates(centers, radius[camera], groups=camera)
+        keep = ~suppressed
+        camera_kept, x, y = camera[keep], centers[keep, 0], centers[keep, 1]
+        h, w = shapes[camera_kept, 0], shapes[camera_kept, 1]
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        labels = stack[camera_kept, np.clip(y, 0, h - 1), np.clip(x, 0, w - 1)].astype(np.intp)
+        labels[~inside] = 0
+
+        n_labels = len(lanes) + 1
+        counts = np.bincount(camera_kept * n_labels + labels, minlength=len(counters) * n_labels)
+        counts = counts.reshape(len(counters), n_labels)[:, 1:]
+        pcu_loads = np.bincount(camera_kept * n_labels + labels, weights=weights[keep],
+                                minlength=len(counters) * n_labels).reshape(len(counters), n_labels)[:, 1:]
+
+        # Rasterize every camera's boxes into its own coverage plane and sum covered cells per lane
+        cover = box_coverage(boxes, coarse_stack.shape[1:], stride, camera, len(counters))
+        covered = np.bincount(coarse_index[cover.ravel()], minlength=len(counters) * n_labels)
+        covered = covered.reshape(len(counters), n_labels)[:, 1:]
+        densities, percentages = _occupancy_density(covered / np.maximum(cells, 1), cells)
+
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        for i, counter in enumerate(counters):
+            counter.counts = counts[i]
+            counter.densities = densities[i]
+            counter.pcu_loads = pcu_loads[i]
+            counter.density_percentage = float(percentages[i])
+            counter.suppressed_indices = np.flatnonzero(suppressed[offsets[i]:offsets[i + 1]])
+            counter.history.push(densities[i])
+        return counts, densities
+
+    @classmethod
+    def _get_mask_stack(cls, counters, frame_shapes, stride):
+        """Return all counters' label masks and coarse label grids stacked into zero-padded arrays.
+
+        Stacks are cached per group of geometries and stride in a small LRU, so independent
+        groups of counters (e.g. one per worker) do not evict each other.
+        """
+        geometries = [counter._get_geometry(frame_shape) for counter, frame_shape in zip(counters, frame_shapes)]
+        key = (tuple(id(g) for g in geometries), stride)
+        with cls._mask_stack_lock:
+            cached = cls._mask_stack_cache.get(key)
+            if cached is not None:
+                cls._mask_stack_cache.move_to_end(key)
+        # Ids can be reused once a geometry is freed, so confirm the cached entry holds these objects
+        if cached is not None and all(a is b for a, b in zip(cached[0], geometries)):
+            return cached[1]
+
+        stack, shapes = _pad_stack([g.label_mask for g in geometries])
+        coarse = [g.coarse_labels(stride) for g in geometries]
+        coarse_stack, _ = _pad_stack([labels for labels, _ in coarse])
+        cells = np.array([c for _, c in coarse], dtype=np.int64).reshape(len(geometries), -1)
+        # Flat (camera, lane) bin of every coarse cell, for per-lane coverage sums
+        coarse_index = (np.arange(len(geometries))[:, None, None] * (cells.shape[1] + 1) + coarse_stack).ravel()
+        result = (stack, shapes, coarse_stack, coarse_index, cells)
+        with cls._mask_stack_lock:
+            cls._mask_stack_cache[key] = (geometries, result)
+            while len(cls._mask_stack_cache) > cls._mask_stack_cache_size:
+                cls._mask_stack_cache.popitem(last=False)
+        return result
+
+    def _get_pcu_table(self):
+        """Return the class-id to PCU lookup array, rebuilt when pcu_weights changes."""
+        if self._pcu_table is None or self._pcu_table[0] != self.pcu_weights:
+            self._pcu_table = (dict(self.pcu_weights), _pcu_table(self.pcu_weights))
+        return self._pcu_table[1]
+
+    def _get_geometry(self, frame_shape=None):
+        """Return the lane geometry compiled for frame_shape (default: the last frame shape seen).
+
+        Compiled geometries are kept in a small LRU keyed by shape and dropped when ROIs change.
+        """
+        shape = tuple(frame_shape[:2]) if frame_shape else self.frame_shape
+        if shape is None:
+            raise ValueError("Frame shape is unknown; pass frame_shape")
+        self.frame_shape = shape
+        if self._pending_rois:
+            for lane, points in self._pending_rois.items():
+                self.lane_rois[lane] = points / (shape[1], shape[0])
+            self._pending_rois.clear()
+            self._invalidate_geometry()
+        geometry = self._geometries.get(shape)
+        if geometry is None:
+            geometry = LaneGeometry.from_normalized(self.lane_rois, shape)
+            self._geometries[shape] = geometry
+            while len(self._geometries) > self.geometry_cache_size:
+                self._geometries.popitem(last=False)
+        else:
+            self._geometries.move_to_end(shape)
+        self.geometry = geometry
+        return geometry
+
+    def _invalidate_geometry(self):
+        """Drop every compiled geometry after an ROI change."""
+        self._geometries.clear()
+        self.geometry = None
 
     def _set_default_rois(self, shape):
         """Set default ROIs to match the wider road layout (200-600 for NS, 150-450 for EW)."""
         h, w = shape[:2]
         # Continuous lane ROIs, adjusted for wider roads and intersection alignment
-        self.set_lane_roi('north', [
-            (w//2-60, 0),        # Top-left, narrower for better fit
-            (w//2+60, 0),        # Top-right
-            (w//2+60, h//2-100), # Bottom-right, before intersection
-            (w//2-60, h//2-100)  # Bottom-left
-        ])
-        self.set_lane_roi('south', [
-            (w//2-60, h//2+100), # Top-left, after intersection
-            (w//2+60, h//2+100), # Top-right
-            (w//2+60, h),        # Bottom-right
-            (w//2-60, h)         # Bottom-left
-        ])
-        self.set_lane_roi('east', [
-            (w//2+50, h//2-60),  # Top-left, fits EW road
-            (w, h//2-60),        # Top-right
-            (w, h//2+60),        # Bottom-right
-            (w//2+50, h//2+60)   # Bottom-left
-        ])
-        self.set_lane_roi('west', [
-            (0, h//2-60),        # Top-left
-            (w//2-50, h//2-60),  # Top-right, fits EW road
-            (w//2-50, h//2+60),  # Bottom-right
-            (0, h//2+60)         # Bottom-left
-        ])
+        defaults = {
+            'north': [
+                (w//2-60, 0),        # Top-left, narrower for better fit
+                (w//2+60, 0),        # Top-right
+                (w//2+60, h//2-100), # Bottom-right, before intersection
+                (w//2-60, h//2-100)  # Bottom-left
+            ],
+            'south': [
+                (w//2-60, h//2+100), # Top-left, after intersection
+                (w//2+60, h//2+100), # Top-right
+                (w//2+60, h),        # Bottom-right
+                (w//2-60, h)         # Bottom-left
+            ],
+            'east': [
+                (w//2+50, h//2-60),  # Top-left, fits EW road
+                (w, h//2-60),        # Top-right
+                (w, h//2+60),        # Bottom-right
+                (w//2+50, h//2+60)   # Bottom-left
+            ],
+            'west': [
+                (0, h//2-60),        # Top-left
+                (w//2-50, h//2-60),  # Top-right, fits EW road
+                (w//2-50, h//2+60),  # Bottom-right
+                (0, h//2+60)         # Bottom-left
+            ]
+        }
+        # Extra lanes (turn pockets, bus lanes) have no default and must be set explicitly
+        for lane, points in defaults.items():
+            if lane in self.lane_rois:
+                self.set_lane_roi(lane, points, shape)
 
     def draw_visualization(self, frame):
         """Draw lane ROIs, stop lines, and lane-wise densities on the frame."""
         if frame is None:
             raise ValueError("Frame cannot be None")
             
+        # Composite the pre-rendered static geometry over its bounding rectangles only
+        _composite(frame, *self._get_static_overlay(frame.shape))
+        
+        # Draw lane-wise densities, re-rendering the text only when the displayed values change
+        lines = tuple(f"{lane.capitalize()}: {density:.1f}%"
+                      for lane, density in zip(self.lane_names, self.densities.tolist()))
+        _composite(frame, *self._get_text_patch(lines, frame.shape))
+        return frame
+
+    def _get_static_overlay(self, frame_shape):
+        """Return the cached layer holding lane ROIs and stop lines for this frame shape."""
+        geometry = self._get_geometry(frame_shape)
+        if self._overlay is not None and self._overlay[0] is geometry and self._overlay[1] == frame_shape:
+            return self._overlay[2]
+
         colors = {
             'north': (0, 255, 0),  # Green for North-South
             'south': (0, 255, 0),  # Green for North-South
             'east': (0, 0, 255),   # Red for East-West
             'west': (0, 0, 255)    # Red for East-West
         }
+        h, w = frame_shape[:2]
+        layer = np.zeros((h, w, 3), dtype=np.uint8)
+        alpha = np.zeros((h, w), dtype=np.uint8)
+        rects = []
         
         # Draw lane ROIs
-        for lane, roi in self.lane_rois.items():
+        for lane, roi in zip(geometry.names, geometry.polygons):
             if roi is not None:
-                cv2.polylines(frame, [roi], True, colors[lane], 2)
+                cv2.polylines(layer, [roi], True, colors.get(lane, (255, 255, 0)), 2, cv2.LINE_8)
+                cv2.polylines(alpha, [roi], True, 255, 2, cv2.LINE_8)
+                rects.append(_bounding_rect(roi, 2, frame_shape))
         
         # Draw stop lines (yellow) using frame dimensions
-        h, w = frame.shape[:2]
         center_x, center_y = w//2, h//2  # Use frame shape for dynamic sizing
-        cv2.line(frame, 
-                 (center_x-80, center_y-20),  # North stop line
-                 (center_x+80, center_y-20),  # North stop line
-                 (0, 255, 255), 2)  # Yellow
-        cv2.line(frame, 
-                 (center_x-80, center_y+20),  # South stop line
-                 (center_x+80, center_y+20),  # South stop line
-                 (0, 255, 255), 2)  # Yellow
+        for stop_y in (center_y-20, center_y+20):  # North and south stop lines
+            cv2.line(layer, (center_x-80, stop_y), (center_x+80, stop_y), (0, 255, 255), 2, cv2.LINE_8)  # Yellow
+            cv2.line(alpha, (center_x-80, stop_y), (center_x+80, stop_y), 255, 2, cv2.LINE_8)
+            rects.append(_bounding_rect([(center_x-80, stop_y), (center_x+80, stop_y)], 2, frame_shape))
         
-        # Draw lane-wise densities
+        self._overlay = (geometry, frame_shape, _make_layer(layer, alpha, rects))
+        return self._overlay[2]
+
+    def _get_text_patch(self, lines, frame_shape):
+        """Return the cached layer rendering of the density lines, rebuilt when the text changes."""
+        if self._text_patch is not None and self._text_patch[:2] == (lines, frame_shape):
+            return self._text_patch[2]
+        font, font_scale, thickness = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2
+        width = max([cv2.getTextSize(text, font, font_scale, thickness)[0][0] for text in lines], default=0)
+        alpha = np.zeros((30 * len(lines) + 15, width + 20), dtype=np.uint8)
         y_pos = 30
-        for lane, density in self.lane_densities.items():
-            cv2.putText(frame, f"{lane.capitalize()}: {density:.1f}%", 
-                       (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        for text in lines:
+            cv2.putText(alpha, text, (10, y_pos), font, font_scale, 255, thickness, cv2.LINE_8)
             y_pos += 30
-            
-        return frame
\ No newline at end of file
+        # Keep the mask binary (newer OpenCV antialiases text regardless of lineType), so
+        # compositing stays a masked copy instead of a float blend on every frame
+        alpha[:] = np.where(alpha >= 128, 255, 0)
+        patch = np.zeros(alpha.shape + (3,), dtype=np.uint8)
+        patch[alpha > 0] = (255, 255, 255)
+        rects = [(0, 0, min(patch.shape[1], frame_shape[1]), min(patch.shape[0], frame_shape[0]))]
+        self._text_patch = (lines, frame_shape, _make_layer(patch, alpha, rects))
+        return self._text_patch[2]
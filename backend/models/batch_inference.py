@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class BatchInferenceService:
+    """Run frames from many camera pipelines through one model call per batch.
+
+    Requests are collected until max_batch frames are waiting or max_wait seconds have passed
+    since the first one, then run as a single batched call; requests with different keyword
+    arguments (e.g. conf) go into separate calls. The service is called like the model it
+    wraps, so a pipeline can use it in place of its own YOLO instance; the worker thread
+    starts with the first request if start() was not called.
+    """
+
+    def __init__(self, model, max_batch=8, max_wait=0.01):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0  # Model calls made
+        self.frames = 0  # Frames inferred
+        self._pending = deque()  # (frame, kwargs key, kwargs, future)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __call__(self, frame, **kwargs):
+        """Infer one frame and return a one-element result list, like model(frame, **kwargs)."""
+        return [self.submit(frame, **kwargs).result()]
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._running = True
+                self._thread = threading.Thread(name="batch-inference", target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the worker; requests still queued fail with RuntimeError."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            while self._pending:
+                self._pending.popleft()[3].set_exception(RuntimeError("Inference service stopped"))
+
+    def submit(self, frame, **kwargs):
+        """Queue a frame for the next batch; returns a Future resolving to its result."""
+        future = Future()
+        self.start()
+        with self._cond:
+            self._pending.append((frame, tuple(sorted(kwargs.items())), kwargs, future))
+            self._cond.notify_all()
+        return future
+
+    def _next_batch(self):
+        """Wait for a full batch or the max_wait window; return the requests sharing the first one's kwargs."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or not self._running)
+            if not self._running:
+                return []
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch and self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            key = self._pending[0][1]
+            batch, rest = [], deque()
+            while self._pending:
+                request = self._pending.popleft()
+                if request[1] == key and len(batch) < self.max_batch:
+                    batch.append(request)
+                else:
+                    rest.append(request)
+            self._pending = rest
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                results = self.model([request[0] for request in batch], **batch[0][2])
+            except Exception as e:
+                for request in batch:
+                    request[3].set_exception(e)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            for request, result in zip(batch, results):
+                request[3].set_result(result)
@@ -0,0 +1,95 @@
+import time
+import numpy as np
+from models.area_counter import detection_boxes
+from models.ring_buffer import RingBuffer
+from models.track_store import TrackStore
+
+
+class DwellTimeTracker:
+    """Time each tracked vehicle spends inside a lane ROI, with per-lane wait statistics.
+
+    Per-track state (current zone and entry time) lives in slot arrays of a TrackStore,
+    so a frame costs O(tracks). A visit ends when the track moves to another zone or is
+    evicted after `ttl`, at the store's last-seen time; its duration goes into that
+    lane's bounded history.
+    """
+
+    def __init__(self, counter, capacity=1024, ttl=2.0, max_samples=500):
+        self.counter = counter  # AreaVehicleCounter providing lane geometry
+        self.store = TrackStore(capacity, ttl)
+        self.zone = np.full(capacity, -1, dtype=np.intp)  # Lane index per slot, -1 outside every ROI
+        self.entered_at = np.zeros(capacity, dtype=np.float64)
+        self.max_samples = max_samples
+        self.waits = {}  # Finished visit durations per lane name
+        self._names = ()
+
+    def reset(self):
+        """Drop every track and all recorded waits."""
+        self.store.clear()
+        self.zone[:] = -1
+        self.waits = {}
+
+    def update(self, detections, now=None, frame_shape=None):
+        """Update dwell state from [x1, y1, x2, y2, track_id, ...] rows; returns the finished visit count."""
+        now = time.time() if now is None else now
+        geometry = self.counter.geometry_for(frame_shape)
+        self._names = geometry.names
+        _, evicted = self.store.evict(now)
+        finished = self._finish(evicted)
+
+        detections = np.asarray(detections)
+        if detections.ndim != 2 or detections.shape[1] < 5 or not len(detections):
+            return finished
+        boxes = detection_boxes(detections)
+        try:
+            ids = detections[:, 4].astype(np.int64)
+        except (ValueError, TypeError):
+            return finished
+        ids, first = np.unique(ids, return_index=True)
+        boxes = boxes[first]
+        lanes = geometry.lookup((boxes[:, :2] + boxes[:, 2:]) // 2) - 1
+
+        # Visits of known tracks that changed zone end when they were last seen in the old one
+        known = self.store.lookup(ids)
+        moved = np.where(known >= 0, self.zone[known], -1) != lanes
+        finished += self._finish(known[moved & (known >= 0)])
+
+        slots, is_new, (_, recycled, recycled_seen) = self.store.assign(ids, now)
+        # Visits of tracks that lost their slot to a full table end before the slot is reused
+        finished += self._finish(recycled, recycled_seen)
+        # Ids beyond the store's capacity are not tracked this frame
+        keep = slots >= 0
+        slots, is_new, lanes, moved = slots[keep], is_new[keep], lanes[keep], moved[keep]
+        self.zone[slots[is_new]] = -1
+        self.zone[slots[moved]] = lanes[moved]
+        self.entered_at[slots[moved]] = now
+        return finished
+
+    def active_waits(self, now=None):
+        """Return (track_ids, lanes, seconds) for tracks currently inside an ROI."""
+        live = np.flatnonzero((self.store.ids >= 0) & (self.zone >= 0))
+        end = self.store.last_seen[live] if now is None else now
+        return self.store.ids[live].copy(), self.zone[live].copy(), end - self.entered_at[live]
+
+    def wait_percentiles(self, q=(50, 90)):
+        """Per-lane percentiles of finished visit durations as {lane: values}."""
+        result = {}
+        for lane in self._names:
+            buffer = self.waits.get(lane)
+            result[lane] = buffer.percentile(q)[..., 0] if buffer is not None else np.zeros(np.shape(q))
+        return result
+
+    def _finish(self, slots, ends=None):
+        """Record the visits held by slots as finished at ends (default: last seen) and clear their zone."""
+        ends = self.store.last_seen[slots] if ends is None else ends
+        inside = self.zone[slots] >= 0
+        slots, ends = slots[inside], ends[inside]
+        lanes = self.zone[slots]
+        durations = ends - self.entered_at[slots]
+        for lane, duration in zip(lanes.tolist(), durations.tolist()):
+            name = self._names[lane]
+            if name not in self.waits:
+                self.waits[name] = RingBuffer(1, self.max_samples)
+            self.waits[name].push(duration)
+        self.zone[slots] = -1
+        return len(slots)
@@ -1,83 +1,302 @@
 import numpy as np
 import cv2
+from models.ring_buffer import RingBuffer
+from models.track_store import TrackStore
+
+
+class GroundPlaneHomography:
+    """Image-to-ground-plane mapping calibrated from 4+ point correspondences.
+
+    Ground coordinates are in meters. The 3x3 matrix is cached and applied in batch;
+    an optional per-pixel lookup table makes repeated mapping a single gather.
+    """
+
+    def __init__(self, image_points, ground_points, frame_shape=None):
+        image_points = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+        ground_points = np.asarray(ground_points, dtype=np.float64).reshape(-1, 2)
+        if len(image_points) < 4 or len(image_points) != len(ground_points):
+            raise ValueError("Need at least 4 matching image and ground points")
+        matrix, _ = cv2.findHomography(image_points, ground_points, 0)
+        if matrix is None:
+            raise ValueError("Calibration points are degenerate")
+        self.matrix = matrix
+        self.inverse = np.linalg.inv(matrix)
+        self.lut = None  # (h, w, 2) ground coordinates per pixel, built on demand
+        if frame_shape is not None:
+            self.build_lut(frame_shape)
+
+    def build_lut(self, frame_shape):
+        """Precompute the ground coordinates of every pixel of a frame shape."""
+        h, w = frame_shape[:2]
+        x = np.arange(w, dtype=np.float64)[None, :]
+        y = np.arange(h, dtype=np.float64)[:, None]
+        m = self.matrix
+        denom = m[2, 0] * x + m[2, 1] * y + m[2, 2]
+        self.lut = np.empty((h, w, 2), dtype=np.float32)
+        self.lut[..., 0] = (m[0, 0] * x + m[0, 1] * y + m[0, 2]) / denom
+        self.lut[..., 1] = (m[1, 0] * x + m[1, 1] * y + m[1, 2]) / denom
+        return self.lut
+
+    def to_ground(self, points):
+        """Map (N, 2) pixel points to ground meters, using the lookup table for integer pixels inside it."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self.lut is None:
+            return _apply_homography(self.matrix, points)
+        h, w = self.lut.shape[:2]
+        px = points.astype(np.int64)
+        hit = (px[:, 0] == points[:, 0]) & (px[:, 1] == points[:, 1])
+        hit &= (px[:, 0] >= 0) & (px[:, 0] < w) & (px[:, 1] >= 0) & (px[:, 1] < h)
+        result = np.empty_like(points)
+        result[hit] = self.lut[px[hit, 1], px[hit, 0]]
+        if not hit.all():
+            result[~hit] = _apply_homography(self.matrix, points[~hit])
+        return result
+
+    def to_image(self, points):
+        """Map (N, 2) ground points in meters back to pixels."""
+        return _apply_homography(self.inverse, np.asarray(points, dtype=np.float64).reshape(-1, 2))
+
+
+def _apply_homography(matrix, points):
+    """Apply a 3x3 homography to (N, 2) points."""
+    mapped = points @ matrix[:2, :2].T + matrix[:2, 2]
+    denom = points @ matrix[2, :2] + matrix[2, 2]
+    return mapped / denom[:, None]
+
 
 class VirtualLineCounter:
-    def __init__(self, line_y):
+    """Count track crossings over any number of line segments.
+
+    Crossings are found for all tracks and lines at once by testing each track's last
+    movement (previous center to current center) against every segment. Per-track
+    history lives in a bounded ring store, and ids not seen for `ttl` frames are evicted.
+    """
+
+    def __init__(self, line_y=None, lines=None, max_history=20, capacity=1024, ttl=30):
+        if lines is None:
+            if line_y is None:
+                raise ValueError("Provide line_y or lines")
+            # A horizontal line spanning any frame width
+            lines = [((-1e6, line_y), (1e6, line_y))]
         self.line_y = line_y
-        self.counts = {'north': 0, 'south': 0}
-        self.track_history = {}
-        self.max_history = 20
+        self.lines = np.asarray(lines, dtype=np.float64).reshape(-1, 2, 2)  # (L, [A, B], [x, y])
+        # crossings[:, 0] counts moves from the left of A->B to its right (image coordinates), [:, 1] the reverse
+        self.crossings = np.zeros((len(self.lines), 2), dtype=np.int64)
+        self.max_history = max_history
+        self.store = TrackStore(capacity, ttl)
+        self.history = np.zeros((capacity, max_history, 2), dtype=np.float64)  # Ring of centers per slot
+        self.history_head = np.zeros(capacity, dtype=np.intp)  # Next write position per slot
+        self.history_len = np.zeros(capacity, dtype=np.intp)
+        self.anchors = np.zeros((capacity, max_history, 2), dtype=np.float64)  # Bottom-center (ground contact) of each stored box
+        self.history_frames = np.zeros((capacity, max_history), dtype=np.int64)  # Frame of each stored center
+        self.frame = 0
+
+    @property
+    def counts(self):
+        """Directional counts for the first line ('south' is downward for the default horizontal line)."""
+        return {'north': int(self.crossings[0, 1]), 'south': int(self.crossings[0, 0])}
+
+    @property
+    def track_history(self):
+        """Recent centers of every live track, oldest first (built on demand)."""
+        result = {}
+        for slot in np.flatnonzero(self.store.ids >= 0).tolist():
+            n = self.history_len[slot]
+            rows = (self.history_head[slot] - n + np.arange(n)) % self.max_history
+            result[int(self.store.ids[slot])] = self.history[slot, rows]
+        return result
+
+    def track_speeds(self, homography, fps, window=5):
+        """Return (track_ids, speeds in m/s) of live tracks from their last `window` moves on the ground plane.
+
+        Boxes are mapped by their bottom-center, the point that actually touches the road;
+        the box center sits above the ground plane and would skew distances with height.
+        """
+        live, p0, p1, elapsed = self._ground_moves(homography, fps, window)
+        speeds = np.linalg.norm(p1 - p0, axis=1) / np.maximum(elapsed, 1e-9)
+        return self.store.ids[live].copy(), speeds
+
+    def track_headways(self, homography, fps, window=5, lane_width=3.5):
+        """Return (track_ids, gaps in m, headways in s) to the nearest track ahead in the same lane.
+
+        A track is ahead when it lies in front along this track's ground-plane heading and
+        within half a lane width of its path. Gaps are measured between ground anchors;
+        tracks with nothing ahead, or standing still, get inf.
+        """
+        live, p0, p1, elapsed = self._ground_moves(homography, fps, window)
+        move = p1 - p0
+        distance = np.linalg.norm(move, axis=1)
+        speeds = distance / np.maximum(elapsed, 1e-9)
+        heading = move / np.maximum(distance, 1e-9)[:, None]
+        # Offset of every track from each track, split along and across its heading
+        offset = p1[None, :] - p1[:, None]
+        along = np.einsum('ijk,ik->ij', offset, heading)
+        across = np.abs(_cross(heading[:, None], offset))
+        ahead = (along > 0) & (across <= lane_width / 2)
+        gaps = np.where(ahead, along, np.inf).min(axis=1, initial=np.inf)
+        headways = np.divide(gaps, speeds, out=np.full(len(gaps), np.inf), where=speeds > 0)
+        return self.store.ids[live].copy(), gaps, headways
+
+    def _ground_moves(self, homography, fps, window):
+        """Return (slots, start points, end points, seconds) of each live track's last `window` moves on the ground."""
+        live = np.flatnonzero((self.store.ids >= 0) & (self.history_len >= 2))
+        steps = np.minimum(self.history_len[live] - 1, window)
+        newest = (self.history_head[live] - 1) % self.max_history
+        oldest = (newest - steps) % self.max_history
+        p1 = homography.to_ground(self.anchors[live, newest])
+        p0 = homography.to_ground(self.anchors[live, oldest])
+        elapsed = (self.history_frames[live, newest] - self.history_frames[live, oldest]) / fps
+        return live, p0, p1, elapsed
     
     def update(self, tracks):
-        for track in tracks:
-            if len(track) < 5:
-                continue
-            try:
-                x1, y1, x2, y2, track_id = map(int, track[:5])
-                y_center = (y1 + y2) // 2
-                if track_id not in self.track_history:
-                    self.track_history[track_id] = [y_center]
-                    continue
-                prev_y = self.track_history[track_id][-1]
-                self.track_history[track_id].append(y_center)
-                if prev_y <= self.line_y < y_center:
-                    self.counts['south'] += 1
-                elif prev_y >= self.line_y > y_center:
-                    self.counts['north'] += 1
-                if len(self.track_history[track_id]) > self.max_history:
-                    self.track_history[track_id] = self.track_history[track_id][-self.max_history:]
-            except ValueError:
-                continue
+        """Update crossings from [x1, y1, x2, y2, track_id] rows; returns this frame's (L, 2) crossings."""
+        self.frame += 1
+        _, evicted = self.store.evict(self.frame)
+        self.history_len[evicted] = 0
+        frame_crossings = np.zeros_like(self.crossings)
+
+        tracks = np.asarray(tracks)
+        if tracks.ndim != 2 or tracks.shape[1] < 5 or not len(tracks):
+            return frame_crossings
+        try:
+            rows = tracks[:, :5].astype(np.int64)
+        except (ValueError, TypeError):
+            return frame_crossings
+        track_ids, first = np.unique(rows[:, 4], return_index=True)
+        rows = rows[first]
+        centers = np.stack(((rows[:, 0] + rows[:, 2]) // 2, (rows[:, 1] + rows[:, 3]) // 2), axis=1).astype(np.float64)
+        anchors = np.stack(((rows[:, 0] + rows[:, 2]) // 2, rows[:, 3]), axis=1).astype(np.float64)
+
+        slots, is_new, _ = self.store.assign(track_ids, self.frame)
+        if (slots < 0).any():
+            # Ids beyond the store's capacity are not tracked this frame
+            keep = slots >= 0
+            slots, is_new, centers, anchors = slots[keep], is_new[keep], centers[keep], anchors[keep]
+        self.history_len[slots[is_new]] = 0
+        self.history_head[slots[is_new]] = 0
+
+        # Segment test between each known track's last move and every line
+        known = np.flatnonzero(~is_new & (self.history_len[slots] > 0))
+        if len(known):
+            p0 = self.history[slots[known], (self.history_head[slots[known]] - 1) % self.max_history]
+            p1 = centers[known]
+            a, b = self.lines[:, 0], self.lines[:, 1]  # (L, 2)
+            ab = b - a
+            side0 = _cross(ab[None], p0[:, None] - a[None])  # (T, L) side of the line before the move
+            side1 = _cross(ab[None], p1[:, None] - a[None])  # and after it
+            move = (p1 - p0)[:, None]
+            # The move must also pass between the segment's end points
+            within = _cross(move, a[None] - p0[:, None]) * _cross(move, b[None] - p0[:, None]) <= 0
+            forward = within & (side0 <= 0) & (side1 > 0)
+            backward = within & (side0 >= 0) & (side1 < 0)
+            frame_crossings[:, 0] = forward.sum(axis=0)
+            frame_crossings[:, 1] = backward.sum(axis=0)
+            self.crossings += frame_crossings
+
+        # Push the current centers and ground anchors into each track's ring
+        heads = self.history_head[slots]
+        self.history[slots, heads] = centers
+        self.anchors[slots, heads] = anchors
+        self.history_frames[slots, heads] = self.frame
+        self.history_head[slots] = (heads + 1) % self.max_history
+        self.history_len[slots] = np.minimum(self.history_len[slots] + 1, self.max_history)
+        return frame_crossings
+
+
+def _cross(u, v):
+    """Z component of the 2-D cross product, broadcast over leading axes."""
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
 
 class TrafficDensityCounter:
     def __init__(self, roi_points=None):
-        self.roi_points = roi_points
-        self.current_vehicles = set()
-        self.density_history = []
+        self.current_ids = np.empty(0, dtype=np.int64)  # Track ids inside the ROI this frame
         self.max_history = 100
+        self.history = RingBuffer(1, self.max_history)
+        self.roi_points = roi_points
+    
+    @property
+    def roi_points(self):
+        return self._roi_points
+    
+    @roi_points.setter
+    def roi_points(self, roi_points):
+        """Compile the ROI once: polygon array, cached area and an edge table for vectorized containment."""
+        self._roi_points = roi_points
+        if roi_points is None:
+            self._roi = None
+            self.roi_area = 0.0
+            return
+        self._roi = np.array(roi_points, dtype=np.int32).reshape(-1, 2)
+        self.roi_area = cv2.contourArea(self._roi)
+        a = self._roi.astype(np.float64)
+        b = np.roll(a, -1, axis=0)
+        d = b - a
+        self._edges = {
+            'ax': a[:, 0], 'ay': a[:, 1], 'dx': d[:, 0], 'dy': d[:, 1],
+            'slope': np.divide(d[:, 0], d[:, 1], out=np.zeros(len(d)), where=d[:, 1] != 0),
+            'lo': np.minimum(a, b), 'hi': np.maximum(a, b)
+        }
+    
+    @property
+    def current_vehicles(self):
+        """Set of track ids inside the ROI this frame."""
+        return set(self.current_ids.tolist())
+    
+    @property
+    def density_history(self):
+        """Recent vehicle counts, oldest first."""
+        return self.history.values()[:, 0]
     
     def set_roi(self, roi_points):
         self.roi_points = roi_points
     
     def point_in_roi(self, point):
-        if self.roi_points is None:
-            return True
-        roi_np = np.array(self.roi_points, dtype=np.int32)
-        return cv2.pointPolygonTest(roi_np, point, False) >= 0
+        return bool(self.points_in_roi(np.array([point]))[0])
+    
+    def points_in_roi(self, points):
+        """Vectorized containment (boundary inclusive) of an (N, 2) array of points."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if self._roi is None:
+            return np.ones(len(points), dtype=bool)
+        e = self._edges
+        px, py = points[:, 0, None], points[:, 1, None]
+        # Even-odd rule: count edges straddling the point's row that cross it to the right
+        straddle = (e['ay'] > py) != (e['ay'] + e['dy'] > py)
+        x_cross = e['ax'] + (py - e['ay']) * e['slope']
+        inside = np.count_nonzero(straddle & (px < x_cross), axis=1) % 2 == 1
+        # Points lying on an edge count as inside, matching cv2.pointPolygonTest(...) >= 0
+        on_line = e['dx'] * (py - e['ay']) - e['dy'] * (px - e['ax']) == 0
+        on_edge = on_line & (px >= e['lo'][:, 0]) & (px <= e['hi'][:, 0]) & (py >= e['lo'][:, 1]) & (py <= e['hi'][:, 1])
+        return inside | on_edge.any(axis=1)
     
     def update(self, tracks, frame_shape=None):
-        self.current_vehicles.clear()
         if self.roi_points is None and frame_shape is not None:
             height, width = frame_shape[:2]
             self.roi_points = [(0, 0), (width, 0), (width, height), (0, height)]
-        for track in tracks:
-            if len(track) < 5:
-                continue
+        self.current_ids = np.empty(0, dtype=np.int64)
+        tracks = np.asarray(tracks)
+        if tracks.ndim == 2 and tracks.shape[1] >= 5 and len(tracks):
             try:
-                x1, y1, x2, y2, track_id = map(int, track[:5])
-                center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
-                if self.point_in_roi((center_x, center_y)):
-                    self.current_vehicles.add(track_id)
+                rows = tracks[:, :5].astype(np.int64)
+                centers = np.stack(((rows[:, 0] + rows[:, 2]) // 2, (rows[:, 1] + rows[:, 3]) // 2), axis=1)
+                self.current_ids = np.unique(rows[self.points_in_roi(centers), 4])
             except ValueError:
-                continue
+                pass
         
-        current_density = len(self.current_vehicles)
-        self.density_history.append(current_density)
-        if len(self.density_history) > self.max_history:
-            self.density_history = self.density_history[-self.max_history:]
+        current_density = len(self.current_ids)
+        self.history.push(current_density)
         
         density_percentage = 0
-        if self.roi_points is not None:
-            roi_area = cv2.contourArea(np.array(self.roi_points, dtype=np.int32))
+        if self.roi_points is not None and self.roi_area > 0:
             avg_vehicle_area = 5000
             occupied_area = current_density * avg_vehicle_area
-            density_percentage = min(100, (occupied_area / roi_area) * 100)
+            density_percentage = min(100, (occupied_area / self.roi_area) * 100)
         
         return current_density, density_percentage
     
     def draw_roi(self, frame):
         if self.roi_points is not None:
-            roi_np = np.array(self.roi_points, dtype=np.int32)
-            cv2.polylines(frame, [roi_np], True, (0, 255, 255), 2)
-            cv2.putText(frame, f"Vehicles in area: {len(self.current_vehicles)}", (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+            cv2.polylines(frame, [self._roi], True, (0, 255, 255), 2)
+            cv2.putText(frame, f"Vehicles in area: {len(self.current_ids)}", (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
         return frame
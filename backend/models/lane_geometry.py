@@ -0,0 +1,117 @@
+import numpy as np
+import cv2
+
+
+def box_coverage(boxes, grid_shape, stride=1, groups=None, n_groups=1):
+    """Rasterize the union of (x1, y1, x2, y2) boxes onto (n_groups, gh, gw) boolean grids.
+
+    Grid cell k samples pixel k * stride + stride // 2. Boxes are stamped into a 2-D
+    difference array and integrated with cumulative sums, so the cost is per grid
+    cell rather than per box.
+    """
+    gh, gw = grid_shape
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    offset = stride // 2
+    # Box [x1, x2) covers the cells ceil((x1 - offset) / stride) .. ceil((x2 - offset) / stride) - 1
+    lo = -((offset - boxes[:, :2]) // stride)
+    hi = -((offset - boxes[:, 2:]) // stride)
+    x1, x2 = np.clip(lo[:, 0], 0, gw), np.clip(hi[:, 0], 0, gw)
+    y1, y2 = np.clip(lo[:, 1], 0, gh), np.clip(hi[:, 1], 0, gh)
+    valid = (x2 > x1) & (y2 > y1)
+    groups = np.zeros(len(boxes), dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+
+    row = gw + 1
+    plane = (gh + 1) * row
+    base = groups[valid] * plane
+    x1, x2, y1, y2 = x1[valid], x2[valid], y1[valid], y2[valid]
+    index = np.concatenate((base + y1 * row + x1, base + y1 * row + x2,
+                            base + y2 * row + x1, base + y2 * row + x2))
+    weights = np.repeat([1.0, -1.0, -1.0, 1.0], len(base))
+    diff = np.bincount(index, weights=weights, minlength=n_groups * plane).astype(np.int32)
+    diff = diff.reshape(n_groups, gh + 1, row)
+    np.cumsum(diff, axis=2, out=diff)
+    np.cumsum(diff, axis=1, out=diff)
+    return diff[:, :gh, :gw] > 0
+
+
+class LaneGeometry:
+    """Lane ROIs compiled once for a frame shape: lane ids, areas, bounding boxes and a label mask."""
+
+    def __init__(self, lane_rois, frame_shape=None):
+        self.names = tuple(lane_rois)
+        if len(self.names) > 255:
+            raise ValueError("At most 255 lanes are supported")
+        self.index = {lane: i for i, lane in enumerate(self.names)}
+        self.polygons = [None if roi is None else np.asarray(roi, dtype=np.int32).reshape(-1, 2)
+                         for roi in lane_rois.values()]
+
+        # Areas and (x1, y1, x2, y2) bounding boxes, zero for lanes without an ROI
+        self.areas = np.zeros(len(self.names), dtype=np.float64)
+        self.bboxes = np.zeros((len(self.names), 4), dtype=np.int32)
+        for i, polygon in enumerate(self.polygons):
+            if polygon is not None:
+                self.areas[i] = cv2.contourArea(polygon)
+                x, y, w, h = cv2.boundingRect(polygon)
+                self.bboxes[i] = (x, y, x + w, y + h)
+
+        if frame_shape:
+            self.shape = tuple(frame_shape[:2])
+        else:
+            # Without a frame shape, cover the extent of the configured ROIs
+            self.shape = (int(self.bboxes[:, 3].max(initial=0)), int(self.bboxes[:, 2].max(initial=0)))
+
+        # One extra row/column so ROIs closed on the far frame edge keep their boundary
+        self.label_mask = np.zeros((self.shape[0] + 1, self.shape[1] + 1), dtype=np.uint8)
+        # Paint in reverse so earlier lanes win where ROIs overlap
+        for lane_id in range(len(self.polygons), 0, -1):
+            polygon = self.polygons[lane_id - 1]
+            if polygon is not None:
+                cv2.fillPoly(self.label_mask, [polygon], lane_id)
+        self._lane_masks = {}
+        self._coarse = {}
+
+    @classmethod
+    def from_normalized(cls, lane_rois, frame_shape):
+        """Compile ROIs given in normalized [0, 1] coordinates for a concrete frame shape."""
+        h, w = frame_shape[:2]
+        scale = np.array([w, h], dtype=np.float64)
+        pixel_rois = {lane: None if roi is None else np.rint(np.asarray(roi) * scale).astype(np.int32)
+                      for lane, roi in lane_rois.items()}
+        return cls(pixel_rois, frame_shape)
+
+    def __len__(self):
+        return len(self.names)
+
+    def lane_mask(self, lane):
+        """Return the boolean pixel mask of one lane (cached)."""
+        if lane not in self._lane_masks:
+            self._lane_masks[lane] = self.label_mask == self.index[lane] + 1
+        return self._lane_masks[lane]
+
+    def indices(self, lanes):
+        """Return the positions of the given lane names in the fixed lane order."""
+        return np.array([self.index[lane] for lane in lanes], dtype=np.intp)
+
+    def lookup(self, centers):
+        """Return the 1-based lane id under each (x, y) center, 0 when outside every ROI."""
+        h, w = self.label_mask.shape
+        x, y = centers[:, 0], centers[:, 1]
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        labels = self.label_mask[np.clip(y, 0, h - 1), np.clip(x, 0, w - 1)].astype(np.intp)
+        labels[~inside] = 0
+        return labels
+
+    def coarse_labels(self, stride):
+        """Return the label mask sampled every `stride` px and the number of sampled cells per lane (cached)."""
+        if stride not in self._coarse:
+            labels = np.ascontiguousarray(self.label_mask[stride // 2::stride, stride // 2::stride])
+            cells = np.bincount(labels.ravel(), minlength=len(self.names) + 1)[1:]
+            self._coarse[stride] = (labels, cells)
+        return self._coarse[stride]
+
+    def occupancy(self, boxes, stride=1):
+        """Return the fraction of each lane ROI covered by the union of boxes and the sampled cell counts."""
+        labels, cells = self.coarse_labels(stride)
+        cover = box_coverage(boxes, labels.shape, stride)[0]
+        covered = np.bincount(labels[cover], minlength=len(self.names) + 1)[1:]
+        return covered / np.maximum(cells, 1), cells
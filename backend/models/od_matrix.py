@@ -0,0 +1,103 @@
+import time
+import numpy as np
+from models.area_counter import detection_boxes
+from models.track_store import TrackStore
+
+
+class ODMatrix:
+    """Origin-destination (turning movement) counts per lane pair, accumulated in time buckets.
+
+    Each track's first and last lane ROI are kept in TrackStore slot arrays; when the track
+    is evicted after `ttl` its movement is added to od[bucket, entry, exit]. Buckets form a
+    ring (96 x 15 minutes covers a day), so memory stays constant however long it runs.
+    """
+
+    def __init__(self, counter, bucket_seconds=900, n_buckets=96, capacity=1024, ttl=2.0):
+        if bucket_seconds <= 0 or n_buckets < 1:
+            raise ValueError("bucket_seconds and n_buckets must be positive")
+        self.counter = counter  # AreaVehicleCounter providing lane geometry
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        self.store = TrackStore(capacity, ttl)
+        self.entry = np.full(capacity, -1, dtype=np.intp)  # First lane seen per slot, -1 if none yet
+        self.exit = np.full(capacity, -1, dtype=np.intp)  # Latest lane seen per slot
+        self.entered_at = np.zeros(capacity, dtype=np.float64)
+        n_lanes = len(counter.lane_rois)
+        self.od = np.zeros((n_buckets, n_lanes, n_lanes), dtype=np.int64)
+        self.epochs = np.full(n_buckets, -1, dtype=np.int64)  # Absolute bucket number held by each ring row
+
+    @property
+    def lane_names(self):
+        return tuple(self.counter.lane_rois)
+
+    def reset(self):
+        """Drop every track and all accumulated counts."""
+        self.store.clear()
+        self.entry[:] = -1
+        self.exit[:] = -1
+        self.od[:] = 0
+        self.epochs[:] = -1
+
+    def update(self, detections, now=None, frame_shape=None):
+        """Update from [x1, y1, x2, y2, track_id, ...] rows; returns the number of movements recorded."""
+        now = time.time() if now is None else now
+        geometry = self.counter.geometry_for(frame_shape)
+        if len(geometry) != self.od.shape[1]:
+            raise ValueError("Lanes changed after the OD matrix was created")
+        _, evicted = self.store.evict(now)
+        recorded = self._record(evicted)
+
+        detections = np.asarray(detections)
+        if detections.ndim != 2 or detections.shape[1] < 5 or not len(detections):
+            return recorded
+        boxes = detection_boxes(detections)
+        try:
+            ids = detections[:, 4].astype(np.int64)
+        except (ValueError, TypeError):
+            return recorded
+        ids, first = np.unique(ids, return_index=True)
+        lanes = geometry.lookup((boxes[first, :2] + boxes[first, 2:]) // 2) - 1
+
+        slots, is_new, (_, recycled, _) = self.store.assign(ids, now)
+        # Tracks that lost their slot to a full table are recorded before the slot is reused
+        recorded += self._record(recycled)
+        # Ids beyond the store's capacity are not tracked this frame
+        slots, is_new, lanes = slots[slots >= 0], is_new[slots >= 0], lanes[slots >= 0]
+        self.entry[slots[is_new]] = -1
+        self.exit[slots[is_new]] = -1
+        self.entered_at[slots[is_new]] = now
+        # Tracks first appearing outside every ROI take the first lane they reach as their entry
+        in_lane = lanes >= 0
+        unset = in_lane & (self.entry[slots] < 0)
+        self.entry[slots[unset]] = lanes[unset]
+        self.exit[slots[in_lane]] = lanes[in_lane]
+        return recorded
+
+    def flush(self):
+        """Record the movements of all live tracks now, e.g. before shutdown."""
+        slots = np.flatnonzero(self.store.ids >= 0)
+        recorded = self._record(slots)
+        self.store.clear()
+        return recorded
+
+    def matrix(self, buckets=None, now=None):
+        """Return the (entry, exit) count matrix summed over the last `buckets` time buckets (all by default)."""
+        current = int((time.time() if now is None else now) // self.bucket_seconds)
+        oldest = current - (self.n_buckets if buckets is None else min(buckets, self.n_buckets)) + 1
+        valid = (self.epochs >= oldest) & (self.epochs <= current)
+        return self.od[valid].sum(axis=0)
+
+    def _record(self, slots):
+        """Add the movements held by slots to their time buckets and clear them."""
+        done = slots[(self.entry[slots] >= 0) & (self.exit[slots] >= 0)]
+        epochs = (self.entered_at[done] // self.bucket_seconds).astype(np.int64)
+        rows = epochs % self.n_buckets
+        # Reuse ring rows whose bucket has expired
+        stale = np.unique(rows[self.epochs[rows] < epochs])
+        self.od[stale] = 0
+        np.maximum.at(self.epochs, rows, epochs)
+        keep = self.epochs[rows] == epochs  # Movements older than their row's bucket are dropped
+        np.add.at(self.od, (rows[keep], self.entry[done[keep]], self.exit[done[keep]]), 1)
+        self.entry[slots] = -1
+        self.exit[slots] = -1
+        return int(keep.sum())
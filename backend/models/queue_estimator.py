@@ -0,0 +1,92 @@
+import numpy as np
+import cv2
+from models.area_counter import detection_boxes
+
+
+class QueueLengthEstimator:
+    """Estimate per-lane queue length from the stop line by projecting boxes onto each lane's axis."""
+
+    def __init__(self, counter, stop_offset=20, max_gap=15, head_tolerance=100, approaches=None):
+        self.counter = counter  # AreaVehicleCounter providing lane geometry
+        self.stop_offset = stop_offset  # Distance (px) from the intersection center to each stop line
+        self.max_gap = max_gap  # Largest gap (px) between vehicles still counted as one queue
+        self.head_tolerance = head_tolerance  # Queue front must lie within this distance of the stop line
+        self.approaches = approaches or {}  # Optional {lane: (stop_point, upstream_direction)} overrides
+        self.lengths = np.zeros(len(counter.lane_rois), dtype=np.float64)  # Queue length (px) per lane
+        self.vehicles = np.zeros(len(counter.lane_rois), dtype=np.int64)  # Vehicles in each queue
+        self._axes = None  # (geometry, stop_points, directions)
+
+    def estimate(self, detections, frame_shape=None):
+        """Return per-lane queue lengths (px from the stop line) and queued vehicle counts."""
+        geometry = self.counter.geometry_for(frame_shape)
+        stop_points, directions = self._get_axes(geometry)
+        n_lanes = len(geometry)
+        self.lengths = np.zeros(n_lanes, dtype=np.float64)
+        self.vehicles = np.zeros(n_lanes, dtype=np.int64)
+
+        detections = np.asarray(detections)
+        if not detections.size:
+            return self.lengths, self.vehicles
+        boxes = detection_boxes(detections)
+        lanes = geometry.lookup((boxes[:, :2] + boxes[:, 2:]) // 2) - 1
+        boxes, lanes = boxes[lanes >= 0], lanes[lanes >= 0]
+        if not len(lanes):
+            return self.lengths, self.vehicles
+
+        # Project the four corners of every box onto its lane axis, measured from the stop line
+        corners = boxes[:, [[0, 1], [2, 1], [2, 3], [0, 3]]].astype(np.float64)
+        t = np.einsum('nkd,nd->nk', corners - stop_points[lanes, None, :], directions[lanes])
+        start, end = t.min(axis=1), t.max(axis=1)
+
+        # Sort by lane, then distance; offset each lane so one running max covers all lanes
+        order = np.lexsort((start, lanes))
+        lanes, start, end = lanes[order], start[order], end[order]
+        base = start.min()
+        span = end.max() - base + self.max_gap + 1
+        shifted_start = start - base + lanes * span
+        shifted_end = end - base + lanes * span
+        reach = np.maximum.accumulate(shifted_end)
+        breaks = np.ones(len(lanes), dtype=bool)
+        breaks[1:] = shifted_start[1:] > reach[:-1] + self.max_gap
+
+        # Merge contiguous intervals into runs and keep the first run of each lane
+        run_starts = np.flatnonzero(breaks)
+        run_lanes = lanes[run_starts]
+        run_heads = start[run_starts]
+        run_tails = np.maximum.reduceat(shifted_end, run_starts) - run_lanes * span + base
+        run_sizes = np.diff(np.append(run_starts, len(lanes)))
+        first = np.ones(len(run_starts), dtype=bool)
+        first[1:] = run_lanes[1:] != run_lanes[:-1]
+        queued = first & (run_heads <= self.head_tolerance)
+
+        self.lengths[run_lanes[queued]] = np.maximum(run_tails[queued], 0.0)
+        self.vehicles[run_lanes[queued]] = run_sizes[queued]
+        return self.lengths, self.vehicles
+
+    def _get_axes(self, geometry):
+        """Return per-lane stop-line points and upstream unit directions, cached per geometry."""
+        if self._axes is not None and self._axes[0] is geometry:
+            return self._axes[1:]
+        h, w = geometry.shape
+        center = np.array([w // 2, h // 2], dtype=np.float64)
+        stop_points = np.zeros((len(geometry), 2), dtype=np.float64)
+        directions = np.zeros((len(geometry), 2), dtype=np.float64)
+        for i, (lane, polygon) in enumerate(zip(geometry.names, geometry.polygons)):
+            if lane in self.approaches:
+                stop_point, direction = self.approaches[lane]
+                direction = np.asarray(direction, dtype=np.float64)
+                stop_points[i] = stop_point
+                directions[i] = direction / np.linalg.norm(direction)
+                continue
+            if polygon is None:
+                continue
+            # The lane axis is the long side of the ROI, pointing upstream away from the intersection
+            (_, _), (rect_w, rect_h), angle = cv2.minAreaRect(polygon.astype(np.float32))
+            theta = np.radians(angle if rect_w >= rect_h else angle + 90)
+            direction = np.array([np.cos(theta), np.sin(theta)])
+            if np.dot(polygon.mean(axis=0) - center, direction) < 0:
+                direction = -direction
+            directions[i] = direction
+            stop_points[i] = center + direction * self.stop_offset
+        self._axes = (geometry, stop_points, directions)
+        return self._axes[1:]
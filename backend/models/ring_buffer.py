@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity history of per-lane values with O(1) push and windowed statistics."""
+
+    def __init__(self, width, capacity=300, ewma_alpha=0.1, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        if not 0 < ewma_alpha <= 1:
+            raise ValueError("ewma_alpha must be in (0, 1]")
+        self.width = width
+        self.capacity = capacity
+        self.ewma_alpha = ewma_alpha
+        self.data = np.zeros((capacity, width), dtype=dtype)
+        self.ewma = np.zeros(width, dtype=np.float64)  # Exponentially weighted mean, updated on push
+        self.head = 0  # Row the next push writes to
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        """Drop all stored values."""
+        self.head = 0
+        self.count = 0
+        self.ewma[:] = 0.0
+
+    def push(self, values):
+        """Append one row of per-lane values, overwriting the oldest row when full."""
+        self.data[self.head] = values
+        if self.count:
+            self.ewma += self.ewma_alpha * (self.data[self.head] - self.ewma)
+        else:
+            self.ewma[:] = self.data[self.head]
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        """Return the most recent row (zeros when empty)."""
+        if not self.count:
+            return np.zeros(self.width, dtype=self.data.dtype)
+        return self.data[self.head - 1]
+
+    def values(self, window=None):
+        """Return the last `window` rows (all stored rows by default), oldest first.
+
+        The result is a view unless the window wraps around the end of the buffer.
+        """
+        n = self.count if window is None else max(0, min(window, self.count))
+        start = self.head - n
+        if start >= 0:
+            return self.data[start:self.head]
+        return np.concatenate((self.data[start:], self.data[:self.head]))
+
+    def mean(self, window=None):
+        """Per-lane rolling mean over the last `window` rows."""
+        rows = self.values(window)
+        return rows.mean(axis=0) if len(rows) else np.zeros(self.width)
+
+    def max(self, window=None):
+        """Per-lane maximum over the last `window` rows."""
+        rows = self.values(window)
+        return rows.max(axis=0) if len(rows) else np.zeros(self.width, dtype=self.data.dtype)
+
+    def percentile(self, q, window=None):
+        """Per-lane q-th percentile over the last `window` rows."""
+        rows = self.values(window)
+        return np.percentile(rows, q, axis=0) if len(rows) else np.zeros(np.shape(q) + (self.width,))
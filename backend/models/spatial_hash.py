@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def neighbor_pairs(points, radius, groups=None):
+    """Return index pairs (i, j), i < j, of points closer than radius using a uniform grid hash.
+
+    radius may be a scalar or a per-point array; points in different groups never pair.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), (len(points),))
+    n = len(points)
+    cell_size = radius.max() if n else 0
+    if n < 2 or cell_size <= 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+
+    # Bucket points into radius-sized cells; any close pair lies in neighboring cells
+    cells = np.floor(points / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0) - 1  # Keep neighbor offsets from wrapping across rows
+    width = cells[:, 0].max() + 2
+    if groups is not None:
+        # Stack each group's rows in its own band so neighbor lookups never cross groups
+        cells[:, 1] += np.asarray(groups, dtype=np.int64) * (cells[:, 1].max() + 2)
+    keys = cells[:, 1] * width + cells[:, 0]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    # Look up all nine neighboring cells of every point in one batch
+    offsets = (np.arange(-1, 2)[:, None] * width + np.arange(-1, 2)[None, :]).ravel()
+    neighbor_keys = (keys[None, :] + offsets[:, None]).ravel()
+    start = np.searchsorted(sorted_keys, neighbor_keys, side='left')
+    counts = np.searchsorted(sorted_keys, neighbor_keys, side='right') - start
+    total = counts.sum()
+
+    # Expand each lookup's [start, end) slice of the sorted order without a Python loop
+    i = np.repeat(np.tile(np.arange(n), len(offsets)), counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(start, counts) + within]
+
+    candidate = i < j
+    i, j = i[candidate], j[candidate]
+    close = np.sum((points[i] - points[j]) ** 2, axis=1) < radius[i] * radius[i]
+    return i[close], j[close]
+
+
+def suppress_duplicates(points, radius, groups=None):
+    """Greedily suppress points within radius of an earlier kept point; return the suppressed mask."""
+    n = len(points)
+    suppressed = np.zeros(n, dtype=bool)
+    i, j = neighbor_pairs(points, radius, groups)
+    if not len(i):
+        return suppressed
+
+    # Resolve in order of the later point: once j is reached, every earlier point is final
+    order = np.lexsort((i, j))
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        if not suppressed[a]:
+            suppressed[b] = True
+    return suppressed
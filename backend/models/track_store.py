@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class TrackStore:
+    """Fixed-capacity table mapping track ids to array slots, with TTL eviction of stale ids.
+
+    Per-track state lives in caller-owned arrays indexed by slot, so memory stays bounded
+    however many ids a long-running stream produces.
+    """
+
+    def __init__(self, capacity=1024, ttl=30):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1")
+        self.capacity = capacity
+        self.ttl = ttl  # Ids unseen for longer than this (frames or seconds) are evicted
+        self.ids = np.full(capacity, -1, dtype=np.int64)  # Track id per slot, -1 when free
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.recycled = 0  # Slots taken from live tracks because the table was full
+        self.dropped = 0  # New ids left untracked because one frame had more than capacity ids
+        self._keys = np.empty(0, dtype=np.int64)  # Sorted live ids
+        self._key_slots = np.empty(0, dtype=np.intp)  # Slot of each sorted id
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, track_ids):
+        """Return the slot of each id, or -1 for ids not in the table."""
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        if not len(self._keys):
+            return np.full(len(track_ids), -1, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(self._keys, track_ids), len(self._keys) - 1)
+        return np.where(self._keys[pos] == track_ids, self._key_slots[pos], -1)
+
+    def assign(self, track_ids, now):
+        """Return (slots, is_new, recycled) for unique track ids, allocating slots for unseen ids and marking all as seen.
+
+        When the table is full, the least recently seen other tracks give up their slots;
+        recycled is (ids, slots, last_seen) of those tracks, so callers can close out their
+        per-slot state before overwriting it, as they do for evict. If one frame alone has
+        more ids than capacity, the surplus new ids get slot -1 and are counted in dropped.
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        slots = self.lookup(track_ids)
+        is_new = slots < 0
+        n_new = int(is_new.sum())
+        recycled = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64))
+        if n_new:
+            free = np.flatnonzero(self.ids < 0)
+            if len(free) < n_new:
+                # Recycle the stalest slots not in use this frame
+                candidates = np.setdiff1d(np.flatnonzero(self.ids >= 0), slots[~is_new])
+                victims = candidates[np.argsort(self.last_seen[candidates], kind='stable')[:n_new - len(free)]]
+                recycled = (self.ids[victims].copy(), victims, self.last_seen[victims].copy())
+                self._release(victims)
+                self.recycled += len(victims)
+                free = np.flatnonzero(self.ids < 0)
+            new = np.flatnonzero(is_new)
+            if len(free) < n_new:
+                self.dropped += n_new - len(free)
+                is_new[new[len(free):]] = False
+                new = new[:len(free)]
+            new_slots = free[:len(new)]
+            slots[new] = new_slots
+            self.ids[new_slots] = track_ids[new]
+            keys = np.concatenate((self._keys, track_ids[new]))
+            key_slots = np.concatenate((self._key_slots, new_slots))
+            order = np.argsort(keys, kind='stable')
+            self._keys, self._key_slots = keys[order], key_slots[order]
+        self.last_seen[slots[slots >= 0]] = now
+        return slots, is_new, recycled
+
+    def evict(self, now):
+        """Free the slots of ids not seen for more than ttl; return (ids, slots) of the evicted tracks."""
+        stale = np.flatnonzero((self.ids >= 0) & (now - self.last_seen > self.ttl))
+        ids = self.ids[stale].copy()
+        if len(stale):
+            self._release(stale)
+        return ids, stale
+
+    def clear(self):
+        """Drop every track."""
+        self.ids[:] = -1
+        self._keys = np.empty(0, dtype=np.int64)
+        self._key_slots = np.empty(0, dtype=np.intp)
+
+    def _release(self, slots):
+        """Return slots to the free pool and remove their ids from the sorted index."""
+        self.ids[slots] = -1
+        keep = self.ids[self._key_slots] >= 0
+        self._keys, self._key_slots = self._keys[keep], self._key_slots[keep]
@@ -0,0 +1,32 @@
+import time
+
+
+class WallClock:
+    """Real time; tick() is a no-op."""
+
+    def now(self):
+        return time.time()
+
+    def tick(self):
+        pass
+
+
+class SimulatedClock:
+    """Simulated time advanced by a fixed dt per tick, so phase timing runs as fast as steps can be computed.
+
+    Exactly one owner ticks it once per simulated step: a TrafficSignalEnv built with
+    tick_clock=True (e.g. for training, where only env.step() is called), or the loop driving
+    several envs that share the clock, which then leave tick_clock off.
+    """
+
+    def __init__(self, dt=0.05, start=0.0):
+        if dt <= 0:
+            raise ValueError("dt must be positive")
+        self.dt = dt
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def tick(self):
+        self.time += self.dt
@@ -1,17 +1,18 @@
-import time
+from rl_traffic_controller.clock import WallClock
 
 class TrafficSignalController:
-    def __init__(self, phases=4):
+    def __init__(self, phases=4, clock=None):
         self.phases = phases
+        self.clock = clock or WallClock()
         self.current_phase = 0
-        self.last_change = time.time()
+        self.last_change = self.clock.now()
         self.emergency_mode = False
         
     def change_phase(self, new_phase):
         if self._validate_phase_change(new_phase):
             print(f"Changing to phase {new_phase}")
             self.current_phase = new_phase
-            self.last_change = time.time()
+            self.last_change = self.clock.now()
             return True
         return False
     
@@ -19,11 +20,11 @@ class TrafficSignalController:
         print("Activating emergency override!")
         self.emergency_mode = True
         self.current_phase = 3  # Special emergency phase
-        self.last_change = time.time()
+        self.last_change = self.clock.now()
         
     def _validate_phase_change(self, new_phase):
         min_green = 15 if not self.emergency_mode else 5
-        elapsed = time.time() - self.last_change
+        elapsed = self.clock.now() - self.last_change
         return (
             new_phase in range(self.phases) and
             elapsed >= min_green and
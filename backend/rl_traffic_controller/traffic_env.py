@@ -1,13 +1,16 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-import time
+from rl_traffic_controller.clock import WallClock
 
 class TrafficSignalEnv(gym.Env):
-    def __init__(self, density_source, signal_controller):
+    def __init__(self, density_source, signal_controller, clock=None, tick_clock=False):
         super().__init__()
         self.density_source = density_source
         self.signal_controller = signal_controller
+        # Shares the controller's clock unless one is given
+        self.clock = clock or getattr(signal_controller, 'clock', None) or WallClock()
+        self.tick_clock = tick_clock  # Tick the clock once per step; only one env per shared clock should
         
         # Define observation space
         self.observation_space = spaces.Box(
@@ -34,7 +37,7 @@ class TrafficSignalEnv(gym.Env):
         
         # Initialize state
         self.current_phase = 0
-        self.phase_start_time = time.time()
+        self.phase_start_time = self.clock.now()
         self.phase_red_times = [0.0, 0.0]  # NS red time, EW red time
 
         # Define phase directions
@@ -49,23 +52,27 @@ class TrafficSignalEnv(gym.Env):
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
-        self.current_phase = 0
-        self.phase_start_time = time.time()
-        self.phase_red_times = [0.0, 0.0]
+        self.set_phase(0)
         self.density_source.reset()
         return self._get_state(), {}
 
+    def set_phase(self, phase):
+        """Switch to phase now, restarting its timer and red times."""
+        self.current_phase = phase
+        self.phase_start_time = self.clock.now()
+        self.phase_red_times = [0.0, 0.0]
+        self.allowed_directions = self.PHASE_DIRECTIONS[phase]
+
     def _get_state(self):
-        return np.array([
-            self.density_source.lane_densities['north'],
-            self.density_source.lane_densities['south'],
-            self.density_source.lane_densities['east'],
-            self.density_source.lane_densities['west']
-        ], dtype=np.float32)
+        lanes = self.density_source.lane_index(["north", "south", "east", "west"])
+        return self.density_source.densities[lanes].astype(np.float32)
 
-    def step(self, action):
+    def step(self, action=None):
+        # Phases advance on the clock; action is accepted for the gym interface only
+        if self.tick_clock:
+            self.clock.tick()
         # Update phase timers
-        current_time = time.time()
+        current_time = self.clock.now()
         time_delta = current_time - self.phase_start_time
         
         # Update red times for non-active phases
@@ -76,10 +83,7 @@ class TrafficSignalEnv(gym.Env):
             
         # Update allowed directions when phase changes
         if time_delta > self.PHASE_DURATIONS[self.current_phase]:
-            self.current_phase = (self.current_phase + 1) % 4
-            self.phase_start_time = current_time
-            self.phase_red_times = [0.0, 0.0]
-            self.allowed_directions = self.PHASE_DIRECTIONS[self.current_phase]
+            self.set_phase((self.current_phase + 1) % 4)
             
         # Get new state
         state = self._get_state()
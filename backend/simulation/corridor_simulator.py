@@ -0,0 +1,152 @@
+import numpy as np
+
+
+class CorridorSimulator:
+    """Headless arterial of coupled intersections, all advanced in one vectorized step.
+
+    Every intersection has four approach links (north, south, east, west) of `link_cells`
+    cells. Vehicles follow Nagel-Schreckenberg rules with parallel updates over all links at
+    once; a red signal acts as an obstacle at the stop line. Through traffic on the arterial
+    leaves one intersection straight into the matching approach of the next, so queues can
+    spill back upstream. Cross-street traffic leaves the network after its intersection.
+    """
+
+    DIRECTIONS = ("north", "south", "east", "west")
+    # Green approaches per phase, matching TrafficSignalEnv.PHASE_DIRECTIONS
+    PHASE_GREEN = np.array([[1, 1, 0, 0], [0, 0, 0, 0], [0, 0, 1, 1], [0, 0, 0, 0]], dtype=bool)
+
+    def __init__(self, n_nodes, link_cells=40, vmax=2, slowdown=0.1, arrival_rate=0.1, seed=None):
+        if n_nodes < 1 or link_cells < 2:
+            raise ValueError("Need at least one node and two cells per link")
+        self.n_nodes = n_nodes
+        self.link_cells = link_cells
+        self.vmax = vmax  # Cells per step
+        self.slowdown = slowdown  # Probability of a random deceleration
+        self.arrival_rate = arrival_rate  # Spawn probability per step on each boundary link
+        self.rng = np.random.default_rng(seed)
+
+        n_links = 4 * n_nodes  # Link k is approach k % 4 of node k // 4
+        self.speed = np.full((n_links, link_cells), -1, dtype=np.int64)  # Speed per cell, -1 when empty
+        self.green = np.zeros((n_nodes, 4), dtype=bool)
+
+        # Eastbound traffic ('west' approach) continues to the next node, westbound ('east') to the previous
+        nodes = np.arange(n_nodes)
+        self.downstream = np.full(n_links, -1, dtype=np.intp)
+        self.downstream[4 * nodes[:-1] + 3] = 4 * nodes[1:] + 3
+        self.downstream[4 * nodes[1:] + 2] = 4 * nodes[:-1] + 2
+        # Links fed from outside the network: all cross streets and the two arterial ends
+        self.boundary = np.ones(n_links, dtype=bool)
+        self.boundary[self.downstream[self.downstream >= 0]] = False
+
+        self.throughput = np.zeros(n_nodes, dtype=np.int64)  # Vehicles discharged per node
+        self.exited = 0
+        self.steps = 0
+
+    def reset(self, seed=None):
+        """Empty the network, reseeding the generator when a seed is given."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.speed[:] = -1
+        self.green[:] = False
+        self.throughput[:] = 0
+        self.exited = 0
+        self.steps = 0
+
+    def set_phases(self, phases):
+        """Set every node's green approaches from its TrafficSignalEnv phase (0-3)."""
+        self.green[:] = self.PHASE_GREEN[np.asarray(phases, dtype=np.intp)]
+
+    def node(self, i):
+        """Density-source view of one intersection, usable by TrafficSignalEnv."""
+        return CorridorNode(self, i)
+
+    @property
+    def occupied(self):
+        return self.speed >= 0
+
+    @property
+    def densities(self):
+        """(n_nodes, 4) share of occupied cells per approach, in percent."""
+        return self.occupied.mean(axis=1).reshape(self.n_nodes, 4) * 100
+
+    @property
+    def queues(self):
+        """(n_nodes, 4) stopped vehicles per approach."""
+        return (self.speed == 0).sum(axis=1).reshape(self.n_nodes, 4)
+
+    def step(self, green=None):
+        """Advance every link one tick; green optionally overrides the (n_nodes, 4) signal states."""
+        if green is not None:
+            self.green[:] = green
+        L = self.link_cells
+        occupied = self.speed >= 0
+        cols = np.arange(L)
+
+        # Free cells past each stop line: none on red, up to the downstream queue tail on green
+        first = np.where(occupied.any(axis=1), occupied.argmax(axis=1), L)
+        beyond = np.where(self.downstream >= 0, first[self.downstream], self.vmax)
+        beyond = np.where(self.green.ravel(), beyond, 0)
+
+        # Position of the nearest vehicle strictly ahead of every cell
+        marked = np.where(occupied, cols, L)
+        ahead = np.empty_like(marked)
+        ahead[:, :-1] = np.minimum.accumulate(marked[:, :0:-1], axis=1)[:, ::-1]
+        ahead[:, -1] = L
+
+        rows, pos = np.nonzero(occupied)
+        gap = ahead[rows, pos] - pos - 1
+        gap = np.where(ahead[rows, pos] == L, gap + beyond[rows], gap)
+        v = np.minimum(np.minimum(self.speed[rows, pos] + 1, self.vmax), gap)
+        v = np.maximum(v - (self.rng.random(len(v)) < self.slowdown), 0)
+        new_pos = pos + v
+
+        speed = np.full_like(self.speed, -1)
+        stay = new_pos < L
+        speed[rows[stay], new_pos[stay]] = v[stay]
+        # Vehicles crossing a stop line either enter the downstream link or leave the network
+        out_rows = rows[~stay]
+        self.throughput += np.bincount(out_rows // 4, minlength=self.n_nodes)
+        target = self.downstream[out_rows]
+        through = target >= 0
+        speed[target[through], new_pos[~stay][through] - L] = v[~stay][through]
+        self.exited += int((~through).sum())
+
+        # Arrivals at the network edge enter the first cell when it is free
+        spawn = self.boundary & (speed[:, 0] < 0) & (self.rng.random(len(speed)) < self.arrival_rate)
+        speed[spawn, 0] = 1
+        self.speed = speed
+        self.steps += 1
+        return self.densities
+
+
+class CorridorNode:
+    """One intersection of a CorridorSimulator with the density-source interface of AreaVehicleCounter."""
+
+    def __init__(self, simulator, index):
+        self.simulator = simulator
+        self.index = index
+
+    @property
+    def lane_names(self):
+        return self.simulator.DIRECTIONS
+
+    @property
+    def densities(self):
+        links = self.simulator.occupied[4 * self.index:4 * self.index + 4]
+        return links.mean(axis=1) * 100
+
+    @property
+    def counts(self):
+        return self.simulator.occupied[4 * self.index:4 * self.index + 4].sum(axis=1)
+
+    @property
+    def density_percentage(self):
+        return float(self.simulator.occupied[4 * self.index:4 * self.index + 4].mean() * 100)
+
+    def lane_index(self, lanes):
+        """Return the positions of the given approach names in the fixed order."""
+        return np.array([self.simulator.DIRECTIONS.index(lane) for lane in lanes], dtype=np.intp)
+
+    def reset(self):
+        """Traffic state belongs to the whole corridor; use CorridorSimulator.reset() to clear it."""
+        pass
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Hourly demand relative to the daily mean, with morning and evening peaks
+DAILY_PROFILE = np.array([0.25, 0.15, 0.1, 0.1, 0.2, 0.5, 1.2, 1.9, 2.0, 1.4, 1.1, 1.1,
+                          1.2, 1.1, 1.1, 1.3, 1.7, 2.1, 1.9, 1.3, 0.9, 0.7, 0.5, 0.35])
+
+
+class ArrivalDemand:
+    """Vehicle arrivals per approach from time-of-day rate profiles, generated in vectorized batches.
+
+    rates is (n_bins, n_approaches) in vehicles per hour, each bin lasting bin_seconds; the
+    profile repeats once it runs out. In 'poisson' mode each bin draws a Poisson count; in
+    'empirical' mode the expected count is used as-is (rounded), e.g. for measured volumes.
+    Arrival times are spread uniformly inside their bin and returned in time order.
+    """
+
+    def __init__(self, rates, bin_seconds=3600, approaches=("north", "south", "east", "west"),
+                 mode="poisson", batch_bins=24, seed=None):
+        self.rates = np.asarray(rates, dtype=np.float64).reshape(-1, len(approaches))
+        if (self.rates < 0).any():
+            raise ValueError("Arrival rates must be non-negative")
+        if mode not in ("poisson", "empirical"):
+            raise ValueError("mode must be 'poisson' or 'empirical'")
+        self.bin_seconds = bin_seconds
+        self.approaches = tuple(approaches)
+        self.mode = mode
+        self.batch_bins = batch_bins
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    @classmethod
+    def from_daily_volumes(cls, volumes, profile=DAILY_PROFILE, **kwargs):
+        """Build hourly rates from vehicles per day per approach shaped by an hourly profile."""
+        profile = np.asarray(profile, dtype=np.float64)
+        rates = np.outer(profile / profile.sum(), np.asarray(volumes, dtype=np.float64)) * len(profile) / 24
+        return cls(rates, bin_seconds=86400 / len(profile), **kwargs)
+
+    def reset(self, seed=None):
+        """Restart from time 0, reseeding the generator when a seed is given."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.times = np.empty(0, dtype=np.float64)  # Pending arrivals, time-ordered
+        self.lanes = np.empty(0, dtype=np.intp)  # Approach index of each pending arrival
+        self._next_bin = 0  # First bin not generated yet
+        self._cursor = 0  # Pending arrivals before this index have been returned
+
+    def arrivals_until(self, t):
+        """Return (times, approach indices) of arrivals in [previous t, t), generating batches as needed."""
+        while self._next_bin * self.bin_seconds < t:
+            self._generate()
+        end = np.searchsorted(self.times, t, side='left')
+        times, lanes = self.times[self._cursor:end], self.lanes[self._cursor:end]
+        self._cursor = end
+        return times, lanes
+
+    def _generate(self):
+        """Append the next batch of bins to the pending arrivals, dropping those already returned."""
+        bins = self._next_bin + np.arange(self.batch_bins)
+        expected = self.rates[bins % len(self.rates)] * (self.bin_seconds / 3600)
+        if self.mode == "poisson":
+            counts = self.rng.poisson(expected)
+        else:
+            counts = np.rint(expected).astype(np.int64)
+        counts = counts.ravel()
+        cells = np.repeat(np.arange(len(counts)), counts)
+        times = (bins[cells // len(self.approaches)] + self.rng.random(len(cells))) * self.bin_seconds
+        lanes = cells % len(self.approaches)
+        order = np.argsort(times, kind='stable')
+        self.times = np.concatenate((self.times[self._cursor:], times[order]))
+        self.lanes = np.concatenate((self.lanes[self._cursor:], lanes[order]))
+        self._cursor = 0
+        self._next_bin += self.batch_bins
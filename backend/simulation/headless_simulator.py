@@ -0,0 +1,144 @@
+import numpy as np
+
+
+class HeadlessTrafficSimulator:
+    """Intersection traffic core with vehicles stored as numpy arrays; step() returns detections without rendering.
+
+    Movement, stop-line clamping and despawn are masked vector operations over all vehicles,
+    following the same rules as the original per-vehicle loop in main.py.
+    """
+
+    DIRECTIONS = ("north", "south", "east", "west")
+    SPEED = 5
+    SPAWN_PROBABILITY = 0.1
+    VEHICLE_SIZE = (40, 20)
+    DESPAWN_MARGIN = 100
+
+    def __init__(self, frame_width=800, frame_height=600, capacity=256, seed=None, demand=None, dt=0.05):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.rng = np.random.default_rng(seed)  # Private generator so runs with the same seed repeat exactly
+        self.demand = demand  # Optional ArrivalDemand replacing the per-step spawn probability
+        self.dt = dt  # Simulated seconds per step, used with demand
+        self.time = 0.0
+        self.pos = np.zeros((capacity, 2), dtype=np.int64)  # Top-left (x, y) per vehicle
+        self.size = np.zeros((capacity, 2), dtype=np.int64)  # (w, h) per vehicle
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.direction = np.zeros(capacity, dtype=np.intp)  # Index into DIRECTIONS
+        self.n = 0
+        self.next_id = 0
+
+        # Per-direction movement table: axis moved along, travel sign, stop line, intersection start, clamp side
+        cx, cy = frame_width // 2, frame_height // 2
+        self.axis = np.array([1, 1, 0, 0], dtype=np.intp)  # North/south move in y, east/west in x
+        self.sign = np.array([1, -1, -1, 1], dtype=np.int64)
+        self.stop_line = np.array([cy - 20, cy + 20, cx - 20, cx + 20], dtype=np.int64)
+        self.intersection_start = np.array([cy - 150, cy + 150, cx - 150, cx + 150], dtype=np.int64)
+        self.clamp_side = np.array([1, -1, 1, -1], dtype=np.int64)  # Clamp point is stop line + side * vehicle length
+        self._allowed = np.zeros(len(self.DIRECTIONS), dtype=bool)
+
+    def __len__(self):
+        return self.n
+
+    def reset(self, seed=None):
+        """Remove every vehicle, reseeding the generator when a seed is given."""
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        self.n = 0
+        self.next_id = 0
+        self.time = 0.0
+        if self.demand is not None:
+            self.demand.reset(seed)
+
+    def add_vehicle(self, direction=None):
+        """Spawn one vehicle at the upstream edge of a direction (random when not given)."""
+        if self.n == len(self.ids):
+            self._grow()
+        w, h = self.VEHICLE_SIZE
+        if direction is None:
+            direction = self.DIRECTIONS[self.rng.integers(len(self.DIRECTIONS))]
+        d = self.DIRECTIONS.index(direction)
+
+        if direction == "north":
+            x, y = self.rng.integers(350, 450), -h
+        elif direction == "south":
+            x, y = self.rng.integers(350, 450), self.frame_height
+        elif direction == "east":
+            x, y = self.frame_width, self.rng.integers(250, 350)
+        else:
+            x, y = -w, self.rng.integers(250, 350)
+
+        i = self.n
+        self.pos[i] = (x, y)
+        self.size[i] = (w, h)
+        self.ids[i] = self.next_id
+        self.direction[i] = d
+        self.n += 1
+        self.next_id += 1
+
+    def step(self, allowed_directions=()):
+        """Spawn, move and despawn vehicles for one tick; returns [x1, y1, x2, y2, id] detections."""
+        if self.demand is not None:
+            _, lanes = self.demand.arrivals_until(self.time + self.dt)
+            for lane in lanes.tolist():
+                self.add_vehicle(self.demand.approaches[lane])
+        elif self.rng.random() < self.SPAWN_PROBABILITY:
+            self.add_vehicle()
+        self.time += self.dt
+        self._move(allowed_directions)
+        return self.detections()
+
+    def detections(self):
+        """Current vehicles as an (n, 5) array of [x1, y1, x2, y2, id] rows."""
+        n = self.n
+        out = np.empty((n, 5), dtype=np.int64)
+        out[:, :2] = self.pos[:n]
+        out[:, 2:4] = self.pos[:n] + self.size[:n]
+        out[:, 4] = self.ids[:n]
+        return out
+
+    def direction_names(self):
+        """Direction name of each current vehicle."""
+        return [self.DIRECTIONS[d] for d in self.direction[:self.n].tolist()]
+
+    def _move(self, allowed_directions):
+        n = self.n
+        if not n:
+            return
+        self._allowed[:] = [direction in allowed_directions for direction in self.DIRECTIONS]
+        d = self.direction[:n]
+        rows = np.arange(n)
+        axis = self.axis[d]
+        sign = self.sign[d]
+        stop = self.stop_line[d]
+        allowed = self._allowed[d]
+        pos = self.pos[rows, axis]
+
+        # Full speed on green, otherwise slow down approaching the stop line
+        speed = np.where(allowed, self.SPEED, np.minimum(self.SPEED, np.abs(pos - stop) // 5))
+        # Vehicles keep moving before the intersection, and through it only on green
+        moving = allowed | (sign * (pos - self.intersection_start[d]) < 0)
+        pos = pos + np.where(moving, sign * speed, 0)
+        # On red, hold vehicles just past the stop line
+        clamp = stop + self.clamp_side[d] * self.size[rows, axis]
+        pos = np.where(~allowed & (sign * (pos - clamp) > 0), clamp, pos)
+        self.pos[rows, axis] = pos
+
+        # Despawn vehicles well outside the frame
+        margin = self.DESPAWN_MARGIN
+        x, y = self.pos[:n, 0], self.pos[:n, 1]
+        keep = (x >= -margin) & (x <= self.frame_width + margin) & (y >= -margin) & (y <= self.frame_height + margin)
+        if not keep.all():
+            kept = np.flatnonzero(keep)
+            k = len(kept)
+            for array in (self.pos, self.size, self.ids, self.direction):
+                array[:k] = array[kept]
+            self.n = k
+
+    def _grow(self):
+        """Double the vehicle capacity."""
+        for name in ("pos", "size", "ids", "direction"):
+            array = getattr(self, name)
+            grown = np.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
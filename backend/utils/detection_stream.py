@@ -0,0 +1,117 @@
+import glob
+import os
+import time
+import numpy as np
+from rl_traffic_controller.clock import SimulatedClock
+
+
+class DetectionRecorder:
+    """Write per-frame detection arrays, timestamps and signal phases to compressed npz shards.
+
+    Each shard holds up to `shard_size` frames: all detection rows stacked, plus per-frame
+    row offsets, timestamps and phases.
+    """
+
+    def __init__(self, directory, shard_size=1000, frame_shape=None):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.frame_shape = frame_shape
+        self.shards = 0
+        self._frames = []
+        self._timestamps = []
+        self._phases = []
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, detections, timestamp=None, phase=-1):
+        """Append one frame of detections (rows of equal width)."""
+        self._frames.append(np.asarray(detections))
+        self._timestamps.append(time.time() if timestamp is None else timestamp)
+        self._phases.append(phase)
+        if len(self._frames) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered frames to the next shard."""
+        if not self._frames:
+            return
+        filled = [frame for frame in self._frames if frame.size]
+        width = filled[0].shape[-1] if filled else 5
+        dtype = np.result_type(*filled) if filled else np.int64
+        rows = [frame.reshape(-1, width).astype(dtype, copy=False) for frame in self._frames]
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in rows], out=offsets[1:])
+        path = os.path.join(self.directory, f"shard_{self.shards:05d}.npz")
+        np.savez_compressed(path, detections=np.concatenate(rows), offsets=offsets,
+                            timestamps=np.array(self._timestamps, dtype=np.float64),
+                            phases=np.array(self._phases, dtype=np.int64),
+                            frame_shape=np.array(self.frame_shape or (), dtype=np.int64))
+        self.shards += 1
+        self._frames, self._timestamps, self._phases = [], [], []
+
+    def close(self):
+        self.flush()
+
+
+class DetectionPlayer:
+    """Replay a recorded detection stream, optionally into a counter and signal environment."""
+
+    def __init__(self, directory):
+        self.paths = sorted(glob.glob(os.path.join(directory, "shard_*.npz")))
+        if not self.paths:
+            raise ValueError(f"No recorded shards in {directory}")
+        with np.load(self.paths[0]) as shard:
+            shape = tuple(shard["frame_shape"].tolist())
+        self.frame_shape = shape or None
+
+    def frames(self):
+        """Yield (timestamp, detections, phase) for every recorded frame, loading one shard at a time."""
+        for path in self.paths:
+            with np.load(path) as shard:
+                detections, offsets = shard["detections"], shard["offsets"]
+                timestamps, phases = shard["timestamps"], shard["phases"]
+            for i in range(len(timestamps)):
+                yield timestamps[i], detections[offsets[i]:offsets[i + 1]], int(phases[i])
+
+    def play(self, counter, env=None, speed=None, frame_shape=None):
+        """Feed every frame to counter.update and, if given, step env; returns the frame count.
+
+        The env runs on recorded time: its clock and its signal controller's are swapped for
+        one set to each frame's timestamp, and recorded phases (>= 0) are applied with
+        env.set_phase before every step.
+        speed=None replays as fast as possible; otherwise recorded time gaps are divided by speed.
+        """
+        frame_shape = frame_shape or self.frame_shape
+        start = first = None
+        n = 0
+        if env is not None:
+            clock = SimulatedClock()
+            saved_clocks = env.clock, env.signal_controller.clock
+            env.clock = env.signal_controller.clock = clock
+        try:
+            for timestamp, detections, phase in self.frames():
+                if speed:
+                    if start is None:
+                        start, first = time.perf_counter(), timestamp
+                    delay = (timestamp - first) / speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                counter.update(detections, frame_shape)
+                if env is not None:
+                    clock.time = float(timestamp)
+                    if n == 0:
+                        # Restart the phase timer on the recording's timeline
+                        env.set_phase(phase if phase >= 0 else env.current_phase)
+                    elif phase >= 0 and phase != env.current_phase:
+                        env.set_phase(phase)
+                    env.step()
+                n += 1
+        finally:
+            if env is not None:
+                env.clock, env.signal_controller.clock = saved_clocks
+        return n
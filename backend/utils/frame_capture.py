@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+
+
+class ThreadedCapture:
+    """Decode frames on a background thread into a bounded ring of preallocated buffers.
+
+    policy selects what the consumer sees:
+      'latest' - always the newest frame; unread older frames are dropped
+      'all'    - every frame in order; capture waits when the ring is full
+      'stride' - every `stride`-th frame in order; skipped frames are grabbed but not decoded
+    Each frame carries a time.monotonic() capture timestamp and a sequence number.
+    """
+
+    POLICIES = ('latest', 'all', 'stride')
+
+    def __init__(self, cap, frame_shape, ring_size=4, policy='latest', stride=2):
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {self.POLICIES}")
+        if ring_size < 3:
+            raise ValueError("ring_size must be at least 3")
+        self.cap = cap
+        self.policy = policy
+        self.stride = max(1, stride)
+        h, w = frame_shape[:2]
+        self.frames = np.empty((ring_size, h, w, 3), dtype=np.uint8)
+        self.timestamps = np.zeros(ring_size, dtype=np.float64)
+        self.sequence = np.zeros(ring_size, dtype=np.int64)
+        self.captured = 0  # Frames read from the source
+        self.dropped = 0  # Decoded frames discarded by the 'latest' policy
+
+        self._free = list(range(ring_size))
+        self._ready = deque()  # Filled, unread slots, oldest first
+        self._held = None  # Slot the consumer is using until its next read
+        self._cond = threading.Condition()
+        self._running = False
+        self._finished = False
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(name="capture", target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def read(self, timeout=None):
+        """Return (frame, timestamp, sequence), or None once the source is exhausted or on timeout.
+
+        The frame is a view into the ring, valid until the next read.
+        """
+        with self._cond:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+                self._cond.notify_all()
+            if not self._cond.wait_for(lambda: self._ready or self._finished or not self._running, timeout):
+                return None
+            if not self._ready:
+                return None
+            if self.policy == 'latest':
+                while len(self._ready) > 1:
+                    self._free.append(self._ready.popleft())
+                    self.dropped += 1
+            slot = self._ready.popleft()
+            self._held = slot
+            self._cond.notify_all()
+        return self.frames[slot], self.timestamps[slot], self.sequence[slot]
+
+    def _acquire_slot(self):
+        """Return a slot to decode into, or None when stopping."""
+        with self._cond:
+            if not self._free and self.policy == 'latest' and self._ready:
+                # Overwrite the oldest unread frame rather than wait
+                self.dropped += 1
+                return self._ready.popleft()
+            self._cond.wait_for(lambda: self._free or not self._running)
+            return self._free.pop() if self._running else None
+
+    def _run(self):
+        h, w = self.frames.shape[1:3]
+        raw = None
+        while self._running:
+            if self.policy == 'stride' and self.captured % self.stride:
+                # Advance the source without decoding frames that would be skipped
+                if not self.cap.grab():
+                    break
+                self.captured += 1
+                continue
+            slot = self._acquire_slot()
+            if slot is None:
+                break
+            ok, raw = self.cap.read(raw)
+            timestamp = time.monotonic()
+            if not ok:
+                with self._cond:
+                    self._free.append(slot)
+                break
+            if raw.shape[:2] == (h, w):
+                self.frames[slot] = raw
+            else:
+                cv2.resize(raw, (w, h), dst=self.frames[slot])
+            with self._cond:
+                self.timestamps[slot] = timestamp
+                self.sequence[slot] = self.captured
+                self._ready.append(slot)
+                self._cond.notify_all()
+            self.captured += 1
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
@@ -0,0 +1,72 @@
+import functools
+import cv2
+import numpy as np
+
+
+@functools.lru_cache(maxsize=2048)
+def text_size(text, font, font_scale, thickness):
+    """Cached cv2.getTextSize; HUD lines repeat from frame to frame."""
+    return cv2.getTextSize(text, font, font_scale, thickness)
+
+
+class HudPanel:
+    """Text panel drawn over a translucent box, blending only the box's pixels in place.
+
+    padding is (x, y) around the text, line_gap the extra height per line used to size the
+    box, line_step the baseline spacing and baseline the first baseline's offset below the
+    box top. opacity 0 draws text only.
+    """
+
+    def __init__(self, origin=(10, 10), font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=0.8, thickness=2,
+                 text_color=(255, 255, 255), bg_color=(0, 0, 0), opacity=0.7,
+                 padding=(10, 10), line_gap=10, line_step=30, baseline=10):
+        self.origin = origin
+        self.font = font
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.text_color = text_color
+        self.bg_color = bg_color
+        self.opacity = opacity
+        self.padding = padding
+        self.line_gap = line_gap
+        self.line_step = line_step
+        self.baseline = baseline
+        self._background = None  # Scratch box filled with bg_color, reused while large enough
+
+    def size(self, lines):
+        """Return the (width, height) of the box around lines."""
+        max_width = 0
+        total_height = 0
+        for text in lines:
+            (text_w, text_h), _ = text_size(text, self.font, self.font_scale, self.thickness)
+            max_width = max(max_width, text_w)
+            total_height += text_h + self.line_gap
+        return max_width + 2 * self.padding[0], total_height + self.padding[1]
+
+    def draw(self, frame, lines):
+        """Draw the panel onto frame in place and return it."""
+        x, y = self.origin
+        if self.opacity > 0:
+            box_w, box_h = self.size(lines)
+            # The box spans (x, y)..(x + box_w, y + box_h) inclusive, clipped to the frame
+            x1, y1 = max(x, 0), max(y, 0)
+            x2, y2 = min(x + box_w + 1, frame.shape[1]), min(y + box_h + 1, frame.shape[0])
+            if x2 > x1 and y2 > y1:
+                roi = frame[y1:y2, x1:x2]
+                background = self._get_background(roi.shape)
+                cv2.addWeighted(background, self.opacity, roi, 1 - self.opacity, 0, dst=roi)
+
+        y_pos = y + self.baseline
+        for text in lines:
+            cv2.putText(frame, text, (x + self.padding[0], y_pos), self.font, self.font_scale,
+                        self.text_color, self.thickness)
+            y_pos += self.line_step
+        return frame
+
+    def _get_background(self, shape):
+        """Return a bg_color view of the given shape from the scratch buffer, growing it when needed."""
+        if (self._background is None or self._background.shape[0] < shape[0]
+                or self._background.shape[1] < shape[1] or self._background.shape[2:] != shape[2:]):
+            self._background = np.empty(shape, dtype=np.uint8)
+            self._background[:] = self.bg_color[:shape[2]] if len(shape) > 2 else self.bg_color[0]
+        return self._background[:shape[0], :shape[1]]
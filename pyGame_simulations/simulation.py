@@ -14,6 +14,15 @@ import threading
 import pygame
 import sys
 import os
+import importlib.util
+
+# The demand model is shared with the backend simulators. It is loaded by path because this
+# script's name shadows the backend 'simulation' package
+demandSpec = importlib.util.spec_from_file_location(
+    'demand', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'simulation', 'demand.py'))
+demandModule = importlib.util.module_from_spec(demandSpec)
+demandSpec.loader.exec_module(demandModule)
+ArrivalDemand, DAILY_PROFILE = demandModule.ArrivalDemand, demandModule.DAILY_PROFILE
 
 # options={
 #    'model':'./cfg/yolo.cfg',     #specifying the path of model
@@ -409,34 +418,36 @@ def updateValues():
         else:
             signals[i].red-=1
 
+# Arrivals per hour for each direction (right, down, left, up), split 40/40/10/10 and shaped by the
+# daily profile; the peak hour matches the old fixed rate of one vehicle every 0.75s.
+# The whole day is compressed into simTime, so each profile hour lasts simTime/24 seconds
+demand = ArrivalDemand(DAILY_PROFILE[:, None] / DAILY_PROFILE.max() * [1920, 1920, 480, 480],
+                       bin_seconds=simTime / 24, approaches=('right', 'down', 'left', 'up'))
+
 # Generating vehicles in the simulation
 def generateVehicles():
+    start = time.time()
     while(True):
-        vehicle_type = random.randint(0,7)
-        if(vehicle_type==4):
-            lane_number = 0
-        else:
-            lane_number = random.randint(0,1) + 1
-        will_turn = 0
-        if(lane_number==2):
-            temp = random.randint(0,4)
-            if(temp<=2):
-                will_turn = 1
-            elif(temp>2):
-                will_turn = 0
-        temp = random.randint(0,999)
-        direction_number = 0
-        a = [400,800,900,1000]
-        if(temp<a[0]):
-            direction_number = 0
-        elif(temp<a[1]):
-            direction_number = 1
-        elif(temp<a[2]):
-            direction_number = 2
-        elif(temp<a[3]):
-            direction_number = 3
-        Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number], will_turn)
-        time.sleep(0.75)
+        # Wait for the next batch of scheduled arrivals instead of a fixed interval
+        time.sleep(0.05)
+        _, arrivals = demand.arrivals_until(time.time() - start)
+        for direction_number in arrivals.tolist():
+            createVehicle(direction_number)
+
+def createVehicle(direction_number):
+    vehicle_type = random.randint(0,7)
+    if(vehicle_type==4):
+        lane_number = 0
+    else:
+        lane_number = random.randint(0,1) + 1
+    will_turn = 0
+    if(lane_number==2):
+        temp = random.randint(0,4)
+        if(temp<=2):
+            will_turn = 1
+        elif(temp>2):
+            will_turn = 0
+    Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number], will_turn)
 
 def simulationTime():
     global timeElapsed, simTime